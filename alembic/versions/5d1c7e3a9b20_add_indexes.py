@@ -0,0 +1,77 @@
+"""add indexes
+
+Revision ID: 5d1c7e3a9b20
+Revises: b1ef9575e8bb
+Create Date: 2026-10-18 14:12:37.481903
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5d1c7e3a9b20"
+down_revision: Union[str, None] = "b1ef9575e8bb"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# имя индекса, таблица, колонки, параметры Postgres
+INDEXES = [
+    ("ix_tasks_creator_id", "tasks", ["creator_id"], {}),
+    ("ix_tasks_status", "tasks", ["status"], {}),
+    ("ix_tasks_deadline", "tasks", ["deadline"], {}),
+    ("ix_tasks_created_at", "tasks", ["created_at"], {}),
+    ("ix_usertasksassociations_task_id", "usertasksassociations", ["task_id"], {}),
+    (
+        "ix_tasks_name_trgm",
+        "tasks",
+        ["name"],
+        {"postgresql_using": "gin", "postgresql_ops": {"name": "gin_trgm_ops"}},
+    ),
+    (
+        "ix_users_email_trgm",
+        "users",
+        ["email"],
+        {"postgresql_using": "gin", "postgresql_ops": {"email": "gin_trgm_ops"}},
+    ),
+]
+
+
+def drop_invalid_index(name: str) -> None:
+    # прерванный CREATE INDEX CONCURRENTLY оставляет невалидный индекс,
+    # который IF NOT EXISTS пропустил бы
+    op.execute(
+        sa.text(
+            "DO $$ BEGIN "
+            "IF EXISTS (SELECT 1 FROM pg_index WHERE NOT indisvalid "
+            f"AND indexrelid = to_regclass('{name}')) THEN "
+            f"DROP INDEX {name}; "
+            "END IF; END $$"
+        )
+    )
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # CONCURRENTLY не блокирует запись в таблицы, но не работает в транзакции
+    with op.get_context().autocommit_block():
+        for name, table, columns, kwargs in INDEXES:
+            drop_invalid_index(name)
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+                **kwargs,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(
+                name, table_name=table, postgresql_concurrently=True, if_exists=True
+            )
@@ -0,0 +1,82 @@
+"""add task search vector
+
+Revision ID: 8a4f2b6c1d37
+Revises: 5d1c7e3a9b20
+Create Date: 2026-10-18 16:40:05.217364
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8a4f2b6c1d37"
+down_revision: Union[str, None] = "5d1c7e3a9b20"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 10_000
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('russian', coalesce({row}name, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce({row}description, '')), 'B')"
+)
+
+
+def upgrade() -> None:
+    op.add_column(
+        "tasks", sa.Column("search_vector", postgresql.TSVECTOR(), nullable=True)
+    )
+    op.execute(
+        "CREATE FUNCTION tasks_search_vector_update() RETURNS trigger AS $$ "
+        f"BEGIN NEW.search_vector := {SEARCH_VECTOR.format(row='NEW.')}; "
+        "RETURN NEW; END $$ LANGUAGE plpgsql"
+    )
+    op.execute(
+        "CREATE TRIGGER tasks_search_vector_update "
+        "BEFORE INSERT OR UPDATE OF name, description ON tasks "
+        "FOR EACH ROW EXECUTE FUNCTION tasks_search_vector_update()"
+    )
+    # существующие строки заполняются пачками с коммитом после каждой,
+    # чтобы не держать блокировку на всю таблицу
+    with op.get_context().autocommit_block():
+        op.execute(
+            "DO $$ DECLARE last_id integer := 0; max_id integer; BEGIN "
+            "SELECT coalesce(max(id), 0) INTO max_id FROM tasks; "
+            "WHILE last_id < max_id LOOP "
+            f"UPDATE tasks SET search_vector = {SEARCH_VECTOR.format(row='')} "
+            f"WHERE id > last_id AND id <= last_id + {BATCH_SIZE} "
+            "AND search_vector IS NULL; "
+            f"last_id := last_id + {BATCH_SIZE}; "
+            "COMMIT; END LOOP; END $$"
+        )
+        op.execute(
+            "DO $$ BEGIN "
+            "IF EXISTS (SELECT 1 FROM pg_index WHERE NOT indisvalid "
+            "AND indexrelid = to_regclass('ix_tasks_search_vector')) THEN "
+            "DROP INDEX ix_tasks_search_vector; "
+            "END IF; END $$"
+        )
+        op.create_index(
+            "ix_tasks_search_vector",
+            "tasks",
+            ["search_vector"],
+            postgresql_using="gin",
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_tasks_search_vector",
+            table_name="tasks",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+    op.execute("DROP TRIGGER tasks_search_vector_update ON tasks")
+    op.execute("DROP FUNCTION tasks_search_vector_update()")
+    op.drop_column("tasks", "search_vector")
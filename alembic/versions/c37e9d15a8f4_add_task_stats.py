@@ -0,0 +1,213 @@
+"""add task stats
+
+Revision ID: c37e9d15a8f4
+Revises: 8a4f2b6c1d37
+Create Date: 2026-10-18 19:05:48.903126
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c37e9d15a8f4"
+down_revision: Union[str, None] = "8a4f2b6c1d37"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# таска учитывается в строке без исполнителя и в строке каждого исполнителя.
+# Триггеры только добавляют изменения в taskstatdeltas и не блокируют общие
+# строки счетчиков, поэтому одновременные запросы не ждут друг друга
+TASK_STATS_APPLY = """
+CREATE FUNCTION task_stats_apply(task tasks, delta integer) RETURNS void AS $$
+BEGIN
+    INSERT INTO taskstatdeltas (creator_id, executor_id, status, deadline, delta)
+    SELECT coalesce(task.creator_id, 0), a.user_id, task.status, task.deadline, delta
+    FROM (
+        SELECT 0 AS user_id
+        UNION ALL
+        SELECT user_id FROM usertasksassociations WHERE task_id = task.id
+    ) a;
+END $$ LANGUAGE plpgsql
+"""
+# удаление обрабатывается в BEFORE-триггере, пока исполнители таски еще
+# не удалены каскадом
+TASKS_STATS_UPDATE = """
+CREATE FUNCTION tasks_stats_update() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        IF (OLD.creator_id, OLD.status, OLD.deadline)
+            IS NOT DISTINCT FROM (NEW.creator_id, NEW.status, NEW.deadline) THEN
+            RETURN NEW;
+        END IF;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM task_stats_apply(OLD, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM task_stats_apply(NEW, 1);
+    END IF;
+    IF TG_OP = 'DELETE' THEN
+        RETURN OLD;
+    END IF;
+    RETURN NEW;
+END $$ LANGUAGE plpgsql
+"""
+# при каскадном удалении таски ее уже не видно, и счетчики исполнителя
+# уже уменьшил триггер tasks
+ASSOCIATIONS_STATS_UPDATE = """
+CREATE FUNCTION usertasksassociations_stats_update() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO taskstatdeltas (creator_id, executor_id, status, deadline, delta)
+        SELECT coalesce(t.creator_id, 0), OLD.user_id, t.status, t.deadline, -1
+        FROM tasks t WHERE t.id = OLD.task_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO taskstatdeltas (creator_id, executor_id, status, deadline, delta)
+        SELECT coalesce(t.creator_id, 0), NEW.user_id, t.status, t.deadline, 1
+        FROM tasks t WHERE t.id = NEW.task_id;
+    END IF;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql
+"""
+# перенос изменений в taskstats и смена дня: в overdue добавляются таски с
+# дедлайном между прошлым днем и сегодняшним. Изменения и таски читаются
+# одним запросом, из одного снимка, поэтому таска не учитывается дважды.
+# Вызывается при чтении статистики; одновременно работает только один вызов,
+# остальные сразу выходят
+TASK_STATS_COMPACT = """
+CREATE FUNCTION task_stats_compact() RETURNS void AS $$
+DECLARE day date;
+BEGIN
+    IF NOT pg_try_advisory_xact_lock('taskstats'::regclass::oid::bigint) THEN
+        RETURN;
+    END IF;
+    -- ждет пересборку rebuild_task_stats и дальше видит ее as_of
+    LOCK TABLE taskstats IN ROW EXCLUSIVE MODE;
+    SELECT as_of INTO day FROM taskstatdays;
+    WITH moved AS (
+        DELETE FROM taskstatdeltas
+        RETURNING creator_id, executor_id, status, deadline, delta
+    ), changes AS (
+        SELECT
+            creator_id, executor_id, status, delta AS count,
+            CASE WHEN deadline < day THEN delta ELSE 0 END AS overdue
+        FROM moved
+        UNION ALL
+        SELECT coalesce(t.creator_id, 0), a.user_id, t.status, 0, 1
+        FROM tasks t
+        JOIN LATERAL (
+            SELECT 0 AS user_id
+            UNION ALL
+            SELECT user_id FROM usertasksassociations WHERE task_id = t.id
+        ) a ON true
+        WHERE t.deadline >= day AND t.deadline < current_date
+    )
+    INSERT INTO taskstats AS s (creator_id, executor_id, status, count, overdue)
+    SELECT creator_id, executor_id, status, sum(count), sum(overdue)
+    FROM changes
+    GROUP BY 1, 2, 3
+    HAVING sum(count) <> 0 OR sum(overdue) <> 0
+    ORDER BY 1, 2, 3
+    ON CONFLICT (creator_id, executor_id, status) DO UPDATE
+    SET count = s.count + EXCLUDED.count, overdue = s.overdue + EXCLUDED.overdue;
+    UPDATE taskstatdays SET as_of = current_date WHERE as_of < current_date;
+END $$ LANGUAGE plpgsql
+"""
+REBUILD = """
+INSERT INTO taskstats (creator_id, executor_id, status, count, overdue)
+SELECT
+    coalesce(t.creator_id, 0), a.user_id, t.status,
+    count(*), count(*) FILTER (WHERE t.deadline < current_date)
+FROM tasks t
+JOIN LATERAL (
+    SELECT 0 AS user_id
+    UNION ALL
+    SELECT user_id FROM usertasksassociations WHERE task_id = t.id
+) a ON true
+GROUP BY 1, 2, 3
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        "taskstats",
+        sa.Column("creator_id", sa.Integer(), nullable=False),
+        sa.Column("executor_id", sa.Integer(), nullable=False),
+        sa.Column(
+            "status",
+            postgresql.ENUM(name="taskstatus", create_type=False),
+            nullable=False,
+        ),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.Column("overdue", sa.Integer(), nullable=False),
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint(
+            "creator_id", "executor_id", "status", name="unique_task_stat"
+        ),
+    )
+    op.create_table(
+        "taskstatdeltas",
+        sa.Column("creator_id", sa.Integer(), nullable=False),
+        sa.Column("executor_id", sa.Integer(), nullable=False),
+        sa.Column(
+            "status",
+            postgresql.ENUM(name="taskstatus", create_type=False),
+            nullable=False,
+        ),
+        sa.Column("deadline", sa.Date(), nullable=True),
+        sa.Column("delta", sa.Integer(), nullable=False),
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "taskstatdays",
+        sa.Column("as_of", sa.Date(), nullable=False),
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.execute("INSERT INTO taskstatdays (as_of) VALUES (current_date)")
+    op.execute(TASK_STATS_APPLY)
+    op.execute(TASKS_STATS_UPDATE)
+    op.execute(ASSOCIATIONS_STATS_UPDATE)
+    op.execute(TASK_STATS_COMPACT)
+    # запись блокируется до конца миграции, чтобы счетчики не разошлись
+    # с первоначальным заполнением
+    op.execute("LOCK TABLE tasks, usertasksassociations IN SHARE MODE")
+    op.execute(
+        "CREATE TRIGGER tasks_stats_update "
+        "AFTER INSERT OR UPDATE OF creator_id, status, deadline ON tasks "
+        "FOR EACH ROW EXECUTE FUNCTION tasks_stats_update()"
+    )
+    op.execute(
+        "CREATE TRIGGER tasks_stats_delete "
+        "BEFORE DELETE ON tasks "
+        "FOR EACH ROW EXECUTE FUNCTION tasks_stats_update()"
+    )
+    op.execute(
+        "CREATE TRIGGER usertasksassociations_stats_update "
+        "AFTER INSERT OR DELETE OR UPDATE OF user_id, task_id "
+        "ON usertasksassociations "
+        "FOR EACH ROW EXECUTE FUNCTION usertasksassociations_stats_update()"
+    )
+    op.execute(REBUILD)
+
+
+def downgrade() -> None:
+    op.execute(
+        "DROP TRIGGER usertasksassociations_stats_update ON usertasksassociations"
+    )
+    op.execute("DROP TRIGGER tasks_stats_delete ON tasks")
+    op.execute("DROP TRIGGER tasks_stats_update ON tasks")
+    op.execute("DROP FUNCTION task_stats_compact()")
+    op.execute("DROP FUNCTION usertasksassociations_stats_update()")
+    op.execute("DROP FUNCTION tasks_stats_update()")
+    op.execute("DROP FUNCTION task_stats_apply(tasks, integer)")
+    op.drop_table("taskstatdays")
+    op.drop_table("taskstatdeltas")
+    op.drop_table("taskstats")
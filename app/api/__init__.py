@@ -1,6 +1,7 @@
 from fastapi import APIRouter
 
 from .endpoints.auth import router as auth_router
+from .endpoints.internal import router as internal_router
 from .endpoints.tasks import router as task_router
 from .endpoints.users import router as user_router
 
@@ -8,3 +9,4 @@ router = APIRouter(prefix="/api")
 router.include_router(auth_router)
 router.include_router(user_router)
 router.include_router(task_router)
+router.include_router(internal_router)
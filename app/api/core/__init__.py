@@ -1,6 +1,28 @@
 __all__ = (
     "ws_manager",
     "websocket_",
+    "RawJSONResponse",
+    "RawJSONCoder",
+    "pubsub",
+    "TTLCache",
+    "Topic",
+    "sse_manager",
+    "CACHE_EXPIRE",
+    "CacheBackend",
+    "CacheTag",
+    "cache_key_builder",
+    "RequestScopeMiddleware",
+    "cache_stats",
+    "cached",
+    "invalidate_tags",
+    "tagged",
 )
 
-from .websocket_manager import websocket_, ws_manager
+from .cache import (CACHE_EXPIRE, CacheBackend, CacheTag, cache_key_builder,
+                    cache_stats, cached, invalidate_tags, tagged)
+from .middleware import RequestScopeMiddleware
+from .pubsub import pubsub
+from .responses import RawJSONCoder, RawJSONResponse
+from .sse import sse_manager
+from .ttl_cache import TTLCache
+from .websocket_manager import Topic, websocket_, ws_manager
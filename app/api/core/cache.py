@@ -0,0 +1,404 @@
+import asyncio
+import hashlib
+import json
+import sys
+import time
+from collections import Counter
+from contextvars import ContextVar
+from functools import wraps
+
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends import Backend
+from fastapi_cache.decorator import cache
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.core.pubsub import pubsub
+from app.api.core.ttl_cache import TTLCache
+from app.api.db.settings_db import settings
+from app.api.schemas import CurrentUser
+
+CACHE_INVALIDATE_CHANNEL = "cache-invalidate"
+
+# записывает значение и добавляет его ключ в множества тегов;
+# множество тега живет не меньше самой долгой записи в нем. Если тег
+# сбросили после начала запроса (ARGV[4]), значение могло устареть
+# и не записывается
+SET_WITH_TAGS = """
+for _, tag in ipairs(KEYS) do
+    local invalidated = redis.call('GET', tag .. ':invalidated')
+    if invalidated and tonumber(invalidated) >= tonumber(ARGV[4]) then
+        return 0
+    end
+end
+if ARGV[3] == '' then
+    redis.call('SET', ARGV[1], ARGV[2])
+else
+    redis.call('SET', ARGV[1], ARGV[2], 'EX', ARGV[3])
+end
+for _, tag in ipairs(KEYS) do
+    redis.call('SADD', tag, ARGV[1])
+    if ARGV[3] == '' then
+        redis.call('PERSIST', tag)
+    elseif redis.call('TTL', tag) < tonumber(ARGV[3]) then
+        redis.call('EXPIRE', tag, ARGV[3])
+    end
+end
+return 1
+"""
+# удаляет все записи тегов и сами множества тегов, запоминая время
+# сброса; возвращает удаленные ключи
+INVALIDATE_TAGS = """
+local deleted = {}
+for _, tag in ipairs(KEYS) do
+    local keys = redis.call('SMEMBERS', tag)
+    for i = 1, #keys, 500 do
+        redis.call('DEL', unpack(keys, i, math.min(i + 499, #keys)))
+    end
+    for _, key in ipairs(keys) do
+        table.insert(deleted, key)
+    end
+    redis.call('DEL', tag)
+    redis.call('SET', tag .. ':invalidated', ARGV[1], 'EX', 60)
+end
+return deleted
+"""
+
+# записи сбрасываются по тегам при изменениях, поэтому живут долго
+CACHE_EXPIRE = 60 * 60
+# истекшая запись еще столько отдается устаревшей, пока один запрос
+# на весь кластер ее пересчитывает
+STALE_TTL = 5 * 60
+# время жизни блокировки пересчета записи в Redis
+LOCK_TTL = 5
+
+# теги записи, ключ которой только что построен в текущем запросе
+_pending_tags: ContextVar[tuple[str, list[str], float] | None] = ContextVar(
+    "pending_tags", default=None
+)
+# ключ, блокировку пересчета которого держит текущий запрос
+_held_lock: ContextVar[str | None] = ContextVar("held_lock", default=None)
+# значение получено от другого запроса и уже лежит в кэше
+_coalesced: ContextVar[bool] = ContextVar("coalesced", default=False)
+
+
+def _normalize(value):
+    if isinstance(value, CurrentUser):
+        # ответ зависит не от конкретного юзера, а только от его роли
+        return {"role": value.role.name}
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json", exclude_none=True)
+    return value
+
+
+def cache_key_builder(
+    func,
+    namespace: str = "",
+    request=None,
+    response=None,
+    args: tuple = (),
+    kwargs: dict | None = None,
+) -> str:
+    """
+    Ключ кэша из значимых параметров эндпоинта: сессия БД не учитывается,
+    фильтры и параметры пагинации приводятся к отсортированному JSON,
+    из текущего юзера берется только роль.
+    """
+
+    params = {
+        name: _normalize(value)
+        for name, value in (kwargs or {}).items()
+        if not isinstance(value, AsyncSession)
+    }
+    digest = hashlib.md5(
+        json.dumps(params, sort_keys=True, default=str).encode()
+    ).hexdigest()
+    return f"{FastAPICache.get_prefix()}:{namespace or func.__name__}:{digest}"
+
+
+def tagged(*tags: str):
+    """
+    Построитель ключа, помечающий запись тегами. Теги - шаблоны с
+    параметрами эндпоинта, например "task:{task_id}".
+    """
+
+    def key_builder(func, namespace: str = "", **kwargs) -> str:
+        key = cache_key_builder(func, namespace, **kwargs)
+        params = kwargs.get("kwargs") or {}
+        started = time.time()
+        if settings.DB.REPLICAS:
+            # реплика может отставать на время залипания: значение,
+            # прочитанное с нее, считается начатым раньше
+            started -= settings.DB.STICKY
+        _pending_tags.set((key, [tag.format(**params) for tag in tags], started))
+        return key
+
+    return key_builder
+
+
+class CacheTag:
+    """Теги записей кэша."""
+
+    TASKS = "tasks"
+    TASKS_LIST = "tasks:list"
+    USERS = "users"
+    USERS_LIST = "users:list"
+
+    @staticmethod
+    def task(task_id) -> str:
+        return f"task:{task_id}"
+
+    @staticmethod
+    def user(user_id) -> str:
+        return f"user:{user_id}"
+
+
+def tag_key(tag: str) -> str:
+    return f"{FastAPICache.get_prefix()}:tag:{tag}"
+
+
+def lock_key(key: str) -> str:
+    return f"{key}:lock"
+
+
+async def invalidate_tags(*tags: str):
+    """Удаление из кэша всех записей с любым из тегов."""
+
+    await FastAPICache.get_backend().invalidate(tags)
+
+
+class SingleFlight:
+    """
+    Объединение одновременных вычислений одного ключа в процессе: первый
+    запрос считает значение, остальные ждут его результат.
+    """
+
+    def __init__(self):
+        self.calls: dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, func):
+        task = self.calls.get(key)
+        if task is None:
+            task = asyncio.create_task(func())
+            self.calls[key] = task
+            task.add_done_callback(lambda _: self.calls.pop(key, None))
+        else:
+            _coalesced.set(True)
+        # запрос-лидер может быть отменен, остальные все равно дождутся
+        return await asyncio.shield(task)
+
+
+single_flight = SingleFlight()
+
+
+def cached(*tags: str, expire: int = CACHE_EXPIRE, coder=None):
+    """
+    Кэширование эндпоинта fastapi-cache с тегами для сброса. При промахе
+    значение считает один запрос на воркер, а если его уже считает другой
+    воркер (блокировка в Redis), запрос дожидается записи в кэш.
+    """
+
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            key = cache_key_builder(wrapper, kwargs=kwargs)
+
+            async def compute():
+                backend = FastAPICache.get_backend()
+                if _held_lock.get() != key and not await backend.acquire(key):
+                    value = await backend.wait(key)
+                    if value is not None:
+                        return True, (coder or FastAPICache.get_coder()).decode(value)
+                try:
+                    return False, await func(*args, **kwargs)
+                finally:
+                    await backend.release(key)
+
+            if _held_lock.get() == key and key in single_flight.calls:
+                # запрос присоединится к чужому вычислению, которое в своем
+                # контексте блокировку не получит и прождет ее до истечения
+                await FastAPICache.get_backend().release(key)
+            from_cache, result = await single_flight.do(key, compute)
+            if from_cache:
+                _coalesced.set(True)
+            return result
+
+        return cache(expire=expire, coder=coder, key_builder=tagged(*tags))(wrapper)
+
+    return decorator
+
+
+class CacheStats:
+    """
+    Счетчики попаданий в L1 (память процесса), в L2 (Redis) и промахов
+    кэша по эндпоинтам в текущем процессе.
+    """
+
+    def __init__(self):
+        self.l1_hits = Counter()
+        self.l2_hits = Counter()
+        self.stale_hits = Counter()
+        self.misses = Counter()
+
+    def record(self, key: str, level: str | None):
+        name = key.split(":")[1]
+        if level == "l1":
+            self.l1_hits[name] += 1
+        elif level == "l2":
+            self.l2_hits[name] += 1
+        elif level == "stale":
+            self.stale_hits[name] += 1
+        else:
+            self.misses[name] += 1
+
+    def report(self) -> dict:
+        report = {}
+        names = (
+            self.l1_hits.keys()
+            | self.l2_hits.keys()
+            | self.stale_hits.keys()
+            | self.misses.keys()
+        )
+        for name in sorted(names):
+            l1_hits, l2_hits = self.l1_hits[name], self.l2_hits[name]
+            l2_hits += self.stale_hits[name]
+            requests = l1_hits + l2_hits + self.misses[name]
+            report[name] = {
+                "l1_hits": l1_hits,
+                "l2_hits": l2_hits,
+                "stale_hits": self.stale_hits[name],
+                "misses": self.misses[name],
+                "l1_hit_ratio": round(l1_hits / requests, 4),
+                "hit_ratio": round((l1_hits + l2_hits) / requests, 4),
+            }
+        return report
+
+
+cache_stats = CacheStats()
+
+
+class CacheBackend(Backend):
+    """
+    Двухуровневый кэш поверх RedisBackend fastapi-cache: L1 - LRU в памяти
+    процесса с коротким временем жизни, L2 - Redis. Считает попадания
+    и промахи, хранит для тегов множества ключей и при сбросе тегов
+    рассылает удаленные ключи всем воркерам, чтобы те очистили свой L1.
+
+    В Redis запись живет на STALE_TTL дольше срока: истекшую запись
+    пересчитывает один запрос, взявший блокировку, а остальным пока
+    отдается устаревшее значение.
+    """
+
+    def __init__(self, backend: Backend, l1_size: int, l1_ttl: int):
+        self.backend = backend
+        self.l1 = TTLCache(maxsize=l1_size, ttl=l1_ttl)
+        self.set_with_tags = backend.redis.register_script(SET_WITH_TAGS)
+        self.invalidate_tags = backend.redis.register_script(INVALIDATE_TAGS)
+        pubsub.subscribe(CACHE_INVALIDATE_CHANNEL, self._drop_l1)
+
+    async def _drop_l1(self, message: str):
+        for key in json.loads(message):
+            self.l1.delete(key)
+
+    def _set_l1(self, key: str, value, expire: int | None):
+        ttl = self.l1.ttl if expire is None else min(self.l1.ttl, expire)
+        self.l1.set(key, (time.monotonic() + ttl, value), ttl=ttl)
+
+    def l1_usage(self) -> dict:
+        return {
+            "entries": len(self.l1),
+            "max_entries": self.l1.maxsize,
+            "bytes": sum(sys.getsizeof(value) for _, value in self.l1.values()),
+        }
+
+    async def get_with_ttl(self, key: str):
+        item = self.l1.get(key)
+        if item is not None:
+            cache_stats.record(key, "l1")
+            expires_at, value = item
+            return max(int(expires_at - time.monotonic()), 0), value
+
+        ttl, value = await self.backend.get_with_ttl(key)
+        if value is None:
+            cache_stats.record(key, None)
+            return ttl, value
+        if ttl < 0:
+            cache_stats.record(key, "l2")
+            self._set_l1(key, value, None)
+            return ttl, value
+
+        ttl -= STALE_TTL
+        if ttl <= 0:
+            # если ключ уже считается в процессе, запрос отдает устаревшее
+            if key not in single_flight.calls and await self.acquire(key):
+                cache_stats.record(key, None)
+                return 0, None
+            cache_stats.record(key, "stale")
+            return 0, value
+        cache_stats.record(key, "l2")
+        self._set_l1(key, value, ttl)
+        return ttl, value
+
+    async def acquire(self, key: str) -> bool:
+        """Блокировка пересчета записи на весь кластер."""
+
+        if await self.backend.redis.set(lock_key(key), 1, nx=True, ex=LOCK_TTL):
+            _held_lock.set(key)
+            return True
+        return False
+
+    async def release(self, key: str):
+        if _held_lock.get() == key:
+            _held_lock.set(None)
+            await self.backend.redis.delete(lock_key(key))
+
+    async def wait(self, key: str):
+        """Ожидание записи, которую пересчитывает держатель блокировки."""
+
+        deadline = time.monotonic() + LOCK_TTL
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            async with self.backend.redis.pipeline(transaction=False) as pipe:
+                value, locked = await pipe.get(key).exists(lock_key(key)).execute()
+            if value is not None or not locked:
+                return value
+        return None
+
+    async def get(self, key: str):
+        return await self.backend.get(key)
+
+    async def set(self, key: str, value, expire: int | None = None):
+        if _coalesced.get():
+            # значение уже записал запрос, который его считал
+            return
+        stale_expire = expire + STALE_TTL if expire else None
+        pending = _pending_tags.get()
+        if pending is None or pending[0] != key:
+            await self.backend.set(key, value, stale_expire)
+            self._set_l1(key, value, expire)
+            return
+        _pending_tags.set(None)
+        _, tags, started = pending
+        stored = await self.set_with_tags(
+            keys=[tag_key(tag) for tag in tags],
+            args=[key, value, stale_expire or "", started],
+        )
+        if stored:
+            self._set_l1(key, value, expire)
+
+    async def invalidate(self, tags):
+        if not tags:
+            return
+        keys = await self.invalidate_tags(
+            keys=[tag_key(tag) for tag in tags], args=[time.time()]
+        )
+        # свой L1 очищается сразу, не дожидаясь сообщения через Redis:
+        # чтение сразу после записи в этом воркере уже не устаревшее
+        for key in keys:
+            self.l1.delete(key)
+        if keys:
+            await pubsub.publish(CACHE_INVALIDATE_CHANNEL, json.dumps(keys))
+
+    async def clear(self, namespace: str | None = None, key: str | None = None):
+        self.l1.clear()
+        return await self.backend.clear(namespace, key)
@@ -0,0 +1,18 @@
+from app.api.db.pool import request_scope
+
+
+class RequestScopeMiddleware:
+    """Сохранение ASGI scope запроса, чтобы пул соединений знал эндпоинт."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        token = request_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_scope.reset(token)
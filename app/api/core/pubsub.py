@@ -0,0 +1,63 @@
+import asyncio
+from collections import defaultdict
+
+
+class PubSub:
+    """
+    Рассылка сообщений всем воркерам через Redis pub/sub. Без Redis
+    (бэкенд memory или до старта приложения) сообщения доставляются
+    только в текущий процесс.
+    """
+
+    def __init__(self):
+        self.redis = None
+        self.handlers: dict[str, list] = defaultdict(list)
+        self._listener: asyncio.Task | None = None
+
+    def subscribe(self, channel: str, handler):
+        """Регистрация асинхронного обработчика сообщений канала."""
+
+        self.handlers[channel].append(handler)
+
+    async def init(self, redis=None):
+        self.redis = redis
+        if self.redis is not None and self.handlers:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        self.redis = None
+
+    async def publish(self, channel: str, message: str):
+        if self.redis is None:
+            await self._dispatch(channel, message)
+            return
+        await self.redis.publish(channel, message)
+
+    async def _listen(self):
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(*self.handlers)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        await self._dispatch(message["channel"], message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error listening pubsub: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.reset()
+
+    async def _dispatch(self, channel: str, message: str):
+        for handler in self.handlers.get(channel, ()):
+            try:
+                await handler(message)
+            except Exception as e:
+                print(f"Error handling message: {e}")
+
+
+pubsub = PubSub()
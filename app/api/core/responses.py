@@ -0,0 +1,31 @@
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from fastapi_cache.coder import Coder
+
+
+class RawJSONResponse(JSONResponse):
+    """JSON-ответ с уже готовым телом, без повторной сериализации."""
+
+    def render(self, content) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return content.encode("utf-8")
+
+
+class RawJSONCoder(Coder):
+    """
+    Кодер кэша, который хранит JSON-тело ответа как есть. Попадание в кэш
+    отдается готовым RawJSONResponse, без декодирования и повторной
+    сериализации.
+    """
+
+    @classmethod
+    def encode(cls, value) -> str:
+        if isinstance(value, Response):
+            return value.body.decode("utf-8")
+        return orjson.dumps(jsonable_encoder(value)).decode("utf-8")
+
+    @classmethod
+    def decode(cls, value: str) -> RawJSONResponse:
+        return RawJSONResponse(value)
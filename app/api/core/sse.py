@@ -0,0 +1,140 @@
+import asyncio
+import itertools
+from collections import deque
+
+from app.api.core.pubsub import pubsub
+from app.api.core.ttl_cache import TTLCache
+from app.api.db.settings_db import settings
+
+EVENT_ID_KEY = "ws-event-id"
+
+
+class EventBuffer:
+    """
+    Кольцевой буфер последних событий топика. evicted - id последнего
+    вытесненного события: клиент, пропустивший его, уже не догонит поток.
+    """
+
+    def __init__(self, size: int, evicted: int = 0):
+        self.events: deque[tuple[int, str]] = deque(maxlen=size)
+        self.evicted = evicted
+
+    def append(self, event_id: int, frame: str):
+        if len(self.events) == self.events.maxlen:
+            self.evicted = self.events[0][0]
+        self.events.append((event_id, frame))
+
+    def since(self, event_id: int) -> list[tuple[int, str]]:
+        return [event for event in self.events if event[0] > event_id]
+
+    @property
+    def last_id(self) -> int:
+        return self.events[-1][0] if self.events else self.evicted
+
+
+class SSEManager:
+    """
+    Поток событий топиков для Server-Sent Events. id событий монотонно
+    растут и общие для всех воркеров, поэтому клиент может переподключиться
+    к любому воркеру с Last-Event-ID и получить пропущенное из буфера.
+    """
+
+    def __init__(self, history_size: int, topics: int, ttl: float, ping: float):
+        self.history_size = history_size
+        self.ping = ping
+        self.history = TTLCache(maxsize=topics, ttl=ttl, on_evict=self._forget)
+        self.listeners: dict[str, set[asyncio.Queue]] = {}
+        self.first_id: int | None = None
+        # последний id из вытесненных буферов: у топика без буфера события
+        # до него могли быть, и восстановить их уже нельзя
+        self.evicted = 0
+        self._counter = itertools.count(1)
+
+    def _forget(self, topic: str, buffer: EventBuffer):
+        self.evicted = max(self.evicted, buffer.last_id)
+
+    async def next_id(self) -> int:
+        if pubsub.redis is None:
+            return next(self._counter)
+        return await pubsub.redis.incr(EVENT_ID_KEY)
+
+    def record(self, topic: str, event_id: int, frame: str):
+        """Сохранение события в буфер топика и отправка слушателям."""
+
+        if self.first_id is None:
+            self.first_id = event_id
+        buffer = self.history.get(topic)
+        if buffer is None:
+            buffer = EventBuffer(self.history_size, self.evicted)
+        buffer.append(event_id, frame)
+        self.history.set(topic, buffer)
+
+        for queue in self.listeners.get(topic, ()):
+            if queue.full():
+                # клиент не успевает читать: обрываем поток, он
+                # переподключится с Last-Event-ID и догонит из буфера
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+            else:
+                queue.put_nowait((event_id, frame))
+
+    def replay(self, topics: list[str], last_event_id: int):
+        """
+        События после last_event_id. None, если часть из них уже вытеснена
+        или воркер запущен позже и их не видел.
+        """
+
+        if self.first_id is None or last_event_id < self.first_id - 1:
+            return None
+        events = []
+        for topic in topics:
+            buffer = self.history.get(topic)
+            evicted = self.evicted if buffer is None else buffer.evicted
+            if evicted > last_event_id:
+                return None
+            if buffer is None:
+                continue
+            events.extend(buffer.since(last_event_id))
+        return sorted(events)
+
+    async def stream(self, topics: list[str], last_event_id: int | None = None):
+        queue = asyncio.Queue(maxsize=self.history_size)
+        for topic in topics:
+            self.listeners.setdefault(topic, set()).add(queue)
+        try:
+            replayed = set()
+            if last_event_id is not None:
+                events = self.replay(topics, last_event_id)
+                if events is None:
+                    yield "event: resync\ndata: {}\n\n"
+                    events = []
+                for event_id, frame in events:
+                    replayed.add(event_id)
+                    yield f"id: {event_id}\ndata: {frame}\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=self.ping)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if event is None:
+                    return
+                event_id, frame = event
+                if event_id not in replayed:
+                    yield f"id: {event_id}\ndata: {frame}\n\n"
+        finally:
+            for topic in topics:
+                listeners = self.listeners.get(topic)
+                if listeners is not None:
+                    listeners.discard(queue)
+                    if not listeners:
+                        del self.listeners[topic]
+
+
+sse_manager = SSEManager(
+    history_size=settings.SSE.HISTORY,
+    topics=settings.SSE.TOPICS,
+    ttl=settings.SSE.TTL,
+    ping=settings.SSE.PING,
+)
@@ -1,41 +1,191 @@
-from fastapi import Depends
+import asyncio
+
+import orjson
+from fastapi import status
 from fastapi.websockets import WebSocket, WebSocketDisconnect, WebSocketState
 
-from app.api.db import get_db_session
-from app.api.endpoints.users_utils import get_user_with_token
+from app.api.core.pubsub import pubsub
+from app.api.core.sse import sse_manager
+from app.api.db.settings_db import settings
+from app.api.endpoints.users_utils import get_user_with_token, read_session
 
+WS_EVENTS_CHANNEL = "ws-events"
 
-class WebSocketManager:
-    def __init__(self):
-        self.active_websockets: dict[int, list[WebSocket]] = {}
 
-    async def connect(self, task_id: int, websocket: WebSocket):
-        await websocket.accept()
-        if task_id not in self.active_websockets:
-            self.active_websockets[task_id] = []
-        self.active_websockets[task_id].append(websocket)
+class Connection:
+    """
+    Сокет клиента с ограниченной очередью исходящих сообщений и своей
+    задачей-писателем. Медленный клиент не задерживает остальных: при
+    переполнении очереди выбрасывается самое старое сообщение, а после
+    max_overflows переполнений соединение закрывается.
+
+    В очереди лежат уже закодированные JSON-кадры. Если клиент подключился
+    с batch, все накопившиеся в очереди события уходят одним кадром-массивом.
+    """
 
-    async def disconnect(self, task_id: int, websocket: WebSocket):
-        self.active_websockets.get(task_id).remove(websocket)
+    def __init__(
+        self,
+        websocket: WebSocket,
+        queue_size: int,
+        max_overflows: int,
+        batch: bool = False,
+    ):
+        self.websocket = websocket
+        self.batch = batch
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.max_overflows = max_overflows
+        self.overflows = 0
+        self.closed = False
+        self.closer: asyncio.Task | None = None
+        self.topics: set[str] = set()
+        self.writer = asyncio.create_task(self._write())
 
-    async def send_message(self, task_id: int, message: dict):
-        clients = self.active_websockets.get(task_id, [])
-        for ws in clients:  # type: WebSocket
+    def put(self, frame: str):
+        if self.closed:
+            return
+        if self.queue.full():
+            self.overflows += 1
+            if self.overflows > self.max_overflows:
+                self.closed = True
+                self.closer = asyncio.create_task(
+                    self.close(code=status.WS_1013_TRY_AGAIN_LATER)
+                )
+                return
+            self.queue.get_nowait()
+        self.queue.put_nowait(frame)
+
+    async def _write(self):
+        while True:
+            frame = await self.queue.get()
+            if self.batch:
+                frames = [frame]
+                while not self.queue.empty():
+                    frames.append(self.queue.get_nowait())
+                frame = "[" + ",".join(frames) + "]"
             try:
-                if ws.client_state == WebSocketState.CONNECTED:
-                    await ws.send_json(message)
+                if self.websocket.client_state == WebSocketState.CONNECTED:
+                    await self.websocket.send_text(frame)
             except Exception as e:
                 print(f"Error sending message: {e}")
+                self.closed = True
+                return
+
+    async def close(self, code: int = status.WS_1000_NORMAL_CLOSURE):
+        self.closed = True
+        self.writer.cancel()
+        if self.websocket.client_state == WebSocketState.CONNECTED:
+            try:
+                await self.websocket.close(code=code)
+            except Exception as e:
+                print(f"Error closing websocket: {e}")
+
+
+class Topic:
+    """Имена топиков, на которые подписываются сокеты."""
+
+    BROADCAST = "broadcast"
+
+    @staticmethod
+    def user(user_id: int) -> str:
+        return f"user:{user_id}"
+
+    @staticmethod
+    def task(task_id: int) -> str:
+        return f"task:{task_id}"
+
+
+class WebSocketManager:
+    def __init__(self, queue_size: int, max_overflows: int):
+        self.queue_size = queue_size
+        self.max_overflows = max_overflows
+        self.topics: dict[str, set[Connection]] = {}
+        self.connections: dict[WebSocket, Connection] = {}
+
+    async def connect(self, websocket: WebSocket, *topics: str):
+        """
+        Принятие сокета и подписка на топики, а также на общий broadcast.
+        Клиент с ?batch=true получает события пачками.
+        """
+
+        await websocket.accept()
+        self.connections[websocket] = Connection(
+            websocket,
+            self.queue_size,
+            self.max_overflows,
+            batch=websocket.query_params.get("batch") == "true",
+        )
+        for topic in (Topic.BROADCAST, *topics):
+            self.subscribe(websocket, topic)
+
+    def subscribe(self, websocket: WebSocket, topic: str):
+        connection = self.connections[websocket]
+        connection.topics.add(topic)
+        self.topics.setdefault(topic, set()).add(connection)
+
+    def unsubscribe(self, websocket: WebSocket, topic: str):
+        connection = self.connections.get(websocket)
+        if connection is None:
+            return
+        connection.topics.discard(topic)
+        subscribers = self.topics.get(topic)
+        if subscribers is not None:
+            subscribers.discard(connection)
+            if not subscribers:
+                del self.topics[topic]
+
+    async def disconnect(self, websocket: WebSocket):
+        connection = self.connections.get(websocket)
+        if connection is None:
+            return
+        for topic in list(connection.topics):
+            self.unsubscribe(websocket, topic)
+        del self.connections[websocket]
+        connection.closed = True
+        connection.writer.cancel()
+
+    async def send_message(self, topic: str, message: dict):
+        """
+        Публикация сообщения в топик для всех воркеров: каждый доставит
+        его своим подписанным сокетам и SSE-клиентам. Сообщение кодируется
+        в JSON один раз, готовый кадр отправляется всем получателям как есть.
+        """
+
+        frame = orjson.dumps(message).decode()
+        event_id = await sse_manager.next_id()
+        await pubsub.publish(WS_EVENTS_CHANNEL, f"{topic}\n{event_id}\n{frame}")
+
+    async def broadcast(self, message: dict):
+        """Публикация сообщения всем подключенным сокетам всех воркеров."""
+
+        await self.send_message(Topic.BROADCAST, message)
+
+    async def deliver(self, data: str):
+        """Постановка сообщения в очереди локальных подписчиков топика."""
+
+        topic, event_id, frame = data.split("\n", 2)
+        for connection in self.topics.get(topic, ()):
+            connection.put(frame)
+        sse_manager.record(topic, int(event_id), frame)
 
 
-ws_manager = WebSocketManager()
+ws_manager = WebSocketManager(
+    queue_size=settings.WS.QUEUE, max_overflows=settings.WS.OVERFLOWS
+)
+pubsub.subscribe(WS_EVENTS_CHANNEL, ws_manager.deliver)
 
 
-async def websocket_(websocket: WebSocket, session=Depends(get_db_session)):
-    user = await get_user_with_token(websocket, session)
-    await ws_manager.connect(user.id, websocket)
+async def websocket_(websocket: WebSocket):
+    # сессия нужна только на время аутентификации, соединение с БД
+    # возвращается в пул до начала цикла чтения сокета
+    async with read_session(websocket.headers.get("authorization")) as session:
+        user = await get_user_with_token(websocket, session)
+    await ws_manager.connect(websocket, Topic.user(user.id))
     try:
         while True:
             data = await websocket.receive_text()
     except WebSocketDisconnect:
-        await ws_manager.disconnect(user.id, websocket)
+        pass
+    finally:
+        # и при любой другой ошибке чтения, иначе соединение и его
+        # писатель остаются в менеджере
+        await ws_manager.disconnect(websocket)
@@ -1,13 +1,16 @@
 __all__ = (
     "Base",
     "db_url",
+    "DBRoute",
     "sessionmanager",
     "get_db_session",
+    "release_sessions",
     "Task",
     "User",
     "UserRole",
     "TaskStatus",
 )
 
-from .database import db_url, get_db_session, sessionmanager
+from .database import db_url, get_db_session, release_sessions, sessionmanager
 from .models import Base, Task, TaskStatus, User, UserRole
+from .routing import DBRoute
@@ -4,10 +4,12 @@ from sqladmin.authentication import AuthenticationBackend
 from sqlalchemy import select
 from starlette.requests import Request
 
+from app.api.core import CacheTag, invalidate_tags
 from app.api.db import Task, User, sessionmanager
 from app.api.db.models import UserRole, UserTasksAssociation
 from app.api.db.settings_db import settings
-from app.api.endpoints.auth import create_access_token, verify_password
+from app.api.endpoints.auth import create_access_token, hasher
+from app.api.endpoints.users_utils import invalidate_principal
 
 router = APIRouter(include_in_schema=False)
 
@@ -25,6 +27,18 @@ class UserModelView(ModelView, model=User):
     column_sortable_list = [User.id]
     column_searchable_list = [User.username, User.role]
 
+    async def after_model_change(self, data, model, is_created, request):
+        await invalidate_principal(model.id)
+        await invalidate_tags(
+            CacheTag.user(model.id), CacheTag.USERS_LIST, CacheTag.TASKS
+        )
+
+    async def after_model_delete(self, model, request):
+        await invalidate_principal(model.id)
+        await invalidate_tags(
+            CacheTag.user(model.id), CacheTag.USERS_LIST, CacheTag.TASKS
+        )
+
 
 class TaskModelView(ModelView, model=Task):
     column_list = [
@@ -40,6 +54,13 @@ class TaskModelView(ModelView, model=Task):
     ]
     column_sortable_list = [Task.id, Task.created_at]
     column_searchable_list = [Task.name]
+    form_excluded_columns = [Task.search_vector]
+
+    async def after_model_change(self, data, model, is_created, request):
+        await invalidate_tags(CacheTag.TASKS, CacheTag.USERS)
+
+    async def after_model_delete(self, model, request):
+        await invalidate_tags(CacheTag.TASKS, CacheTag.USERS)
 
 
 class UserTasksAssociationModelView(ModelView, model=UserTasksAssociation):
@@ -50,6 +71,20 @@ class UserTasksAssociationModelView(ModelView, model=UserTasksAssociation):
         UserTasksAssociation.task_id,
     ]
 
+    async def after_model_change(self, data, model, is_created, request):
+        await invalidate_tags(
+            CacheTag.task(model.task_id),
+            CacheTag.TASKS_LIST,
+            CacheTag.user(model.user_id),
+        )
+
+    async def after_model_delete(self, model, request):
+        await invalidate_tags(
+            CacheTag.task(model.task_id),
+            CacheTag.TASKS_LIST,
+            CacheTag.user(model.user_id),
+        )
+
 
 class AdminAuth(AuthenticationBackend):
     """Вход в админку разрешен только админам."""
@@ -66,7 +101,7 @@ class AdminAuth(AuthenticationBackend):
 
             if (
                 user
-                and verify_password(password, user.password)
+                and await hasher.verify(password, user.password)
                 and user.role == UserRole.ADMIN
             ):
                 request.session.update(
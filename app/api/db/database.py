@@ -1,4 +1,5 @@
 import contextlib
+import itertools
 from typing import AsyncIterator
 
 from sqlalchemy.ext.asyncio import (
@@ -8,32 +9,92 @@ from sqlalchemy.ext.asyncio import (
     create_async_engine,
 )
 
-from app.api.db.settings_db import settings
+from app.api.db.pool import InstrumentedPool, instrument, request_scope
+from app.api.db.settings_db import PoolSettings, settings
+
+
+def make_db_url(host: str, port: int) -> str:
+    return (
+        f"postgresql+asyncpg://{settings.DB.USER}:"
+        f"{settings.DB.PASSWORD}@{host}:"
+        f"{port}/{settings.DB.NAME}"
+    )
+
+
+def make_replica_url(replica: str) -> str:
+    host, _, port = replica.partition(":")
+    return make_db_url(host, int(port or settings.DB.PORT))
+
+
+db_url: str = make_db_url(settings.DB.HOST, settings.DB.PORT)
+
+
+def make_engine(url: str, pool: PoolSettings, echo: bool = False):
+    engine = create_async_engine(
+        url=url,
+        echo=echo,
+        poolclass=InstrumentedPool,
+        pool_size=pool.SIZE,
+        max_overflow=pool.OVERFLOW,
+        pool_timeout=pool.TIMEOUT,
+        pool_recycle=pool.RECYCLE,
+        pool_pre_ping=pool.PREPING,
+        connect_args={"prepared_statement_cache_size": pool.STATEMENTS},
+    )
+    instrument(engine.pool)
+    return engine
 
-db_url: str = (
-    f"postgresql+asyncpg://{settings.DB.USER}:"
-    f"{settings.DB.PASSWORD}@{settings.DB.HOST}:"
-    f"{settings.DB.PORT}/{settings.DB.NAME}"
-)
+
+def make_session_maker(engine):
+    return async_sessionmaker(
+        bind=engine,
+        autoflush=False,
+        autocommit=False,
+        expire_on_commit=False,
+    )
 
 
 class DBSessionManager:
-    def __init__(self, url: str, echo: bool = False):
-        self.engine = create_async_engine(url=url, echo=echo)
-        self.session_maker = async_sessionmaker(
-            bind=self.engine,
-            autoflush=False,
-            autocommit=False,
-            expire_on_commit=False,
+    """
+    Сессии основной БД и, если заданы реплики, сессии только для чтения,
+    которые по очереди раздаются по репликам.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        pool: PoolSettings,
+        replica_urls: list[str] | None = None,
+        echo: bool = False,
+    ):
+        self.engine = make_engine(url, pool, echo)
+        self.session_maker = make_session_maker(self.engine)
+        self.replica_engines = [
+            make_engine(replica_url, pool, echo) for replica_url in replica_urls or []
+        ]
+        self.replica_session_makers = itertools.cycle(
+            [make_session_maker(engine) for engine in self.replica_engines]
         )
 
     async def close(self):
         if self.engine is None:
             raise Exception("DatabaseSessionManager не инициализирован")
         await self.engine.dispose()
+        for engine in self.replica_engines:
+            await engine.dispose()
 
         self.engine = None
         self.session_maker = None
+        self.replica_engines = []
+        self.replica_session_makers = itertools.cycle([])
+
+    def pool_stats(self) -> dict:
+        if self.engine is None:
+            raise Exception("DBSessionManager не инициализирован")
+        return {
+            "primary": self.engine.pool.report(),
+            "replicas": [engine.pool.report() for engine in self.replica_engines],
+        }
 
     @contextlib.asynccontextmanager
     async def connect(self) -> AsyncIterator[AsyncConnection]:
@@ -61,10 +122,55 @@ class DBSessionManager:
         finally:
             await session.close()
 
+    @contextlib.asynccontextmanager
+    async def read_session(self) -> AsyncIterator[AsyncSession]:
+        """Сессия для чтения на следующей реплике или на основной БД без реплик."""
+
+        if self.session_maker is None:
+            raise Exception("DBSessionManager не инициализирован")
+
+        session_maker = next(self.replica_session_makers, self.session_maker)
+        session = session_maker()
+        try:
+            yield session
+        except Exception:
+            await session.rollback()
+            raise
+        finally:
+            await session.close()
+
+
+sessionmanager = DBSessionManager(
+    url=db_url,
+    pool=settings.DB.POOL,
+    replica_urls=[make_replica_url(replica) for replica in settings.DB.REPLICAS],
+    echo=False,
+)
+
+
+def track_session(session: AsyncSession):
+    """
+    Сессия запроса закрывается сразу после эндпоинта, а не после
+    сериализации ответа, и ее соединение раньше возвращается в пул.
+    """
+
+    scope = request_scope.get()
+    if scope is not None:
+        scope.setdefault("db_sessions", []).append(session)
+
+
+async def release_sessions():
+    """Закрытие сессий текущего запроса."""
 
-sessionmanager = DBSessionManager(url=db_url, echo=False)
+    scope = request_scope.get()
+    if scope is None:
+        return
+    for session in scope.pop("db_sessions", ()):
+        await session.close()
 
 
 async def get_db_session():
+    # соединение берется из пула только при первом запросе к БД
     async with sessionmanager.session() as session:
+        track_session(session)
         yield session
@@ -1,10 +1,15 @@
 from datetime import date
 from enum import Enum as PyEnum
 
-from sqlalchemy import Enum, ForeignKey, String, Text, UniqueConstraint, func
+from sqlalchemy import (Enum, ForeignKey, Index, String, Text,
+                        UniqueConstraint, func)
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import (DeclarativeBase, Mapped, declared_attr,
                             mapped_column, relationship, validates)
 
+# конфигурация полнотекстового поиска: русские слова и латиница со стеммингом
+SEARCH_CONFIG = "russian"
+
 
 class UserRole(PyEnum):
     ADMIN = "admin"
@@ -40,7 +45,10 @@ class UserTasksAssociation(Base):
         ),
     )
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
-    task_id: Mapped[int] = mapped_column(ForeignKey("tasks.id", ondelete="CASCADE"))
+    # уникальный индекс начинается с user_id, для поиска по таске нужен свой
+    task_id: Mapped[int] = mapped_column(
+        ForeignKey("tasks.id", ondelete="CASCADE"), index=True
+    )
     is_executor: Mapped[bool] = mapped_column(default=False)
 
     user: Mapped["User"] = relationship(
@@ -55,6 +63,15 @@ class UserTasksAssociation(Base):
 
 
 class User(Base):
+    __table_args__ = (
+        Index(
+            "ix_users_email_trgm",
+            "email",
+            postgresql_using="gin",
+            postgresql_ops={"email": "gin_trgm_ops"},
+        ),
+    )
+
     username: Mapped[str] = mapped_column(unique=True)
     password: Mapped[str] = mapped_column(nullable=False)
     email: Mapped[str] = mapped_column(unique=True)
@@ -77,20 +94,37 @@ class User(Base):
 
 
 class Task(Base):
+    __table_args__ = (
+        # триграммный индекс для фильтра name__ilike
+        Index(
+            "ix_tasks_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+        Index("ix_tasks_search_vector", "search_vector", postgresql_using="gin"),
+    )
+
     name: Mapped[str] = mapped_column(String(155))
     description: Mapped[str] = mapped_column(Text, nullable=True)
     created_at: Mapped[date] = mapped_column(
         server_default=func.today(),
         default=date.today,
+        index=True,
     )
     urgency: Mapped[bool] = mapped_column(default=False, server_default="false")
     status: Mapped[TaskStatus] = mapped_column(
-        Enum(TaskStatus), default=TaskStatus.CREATED.name, server_default="CREATED"
+        Enum(TaskStatus),
+        default=TaskStatus.CREATED.name,
+        server_default="CREATED",
+        index=True,
     )
-    deadline: Mapped[date] = mapped_column(nullable=True)
+    deadline: Mapped[date] = mapped_column(nullable=True, index=True)
     creator_id: Mapped[int] = mapped_column(
-        ForeignKey("users.id", ondelete="SET NULL"), nullable=True
+        ForeignKey("users.id", ondelete="SET NULL"), nullable=True, index=True
     )
+    # заполняется триггером из name (вес A) и description (вес B)
+    search_vector: Mapped[str] = mapped_column(TSVECTOR, nullable=True, deferred=True)
 
     task_detail: Mapped[list["UserTasksAssociation"]] = relationship(
         back_populates="task", cascade="all, delete", passive_deletes=True
@@ -109,3 +143,47 @@ class Task(Base):
 
     def __str__(self):
         return f"{self.name}"
+
+
+class TaskStat(Base):
+    """
+    Счетчики тасок по (создатель, исполнитель, статус). Строка с executor_id = 0
+    считает сами таски, остальные - назначения исполнителям; creator_id = 0 -
+    таски удаленных создателей. overdue - сколько из них с дедлайном раньше
+    TaskStatDay.as_of. Изменения сюда переносит из TaskStatDelta функция
+    Postgres task_stats_compact.
+    """
+
+    __table_args__ = (
+        UniqueConstraint(
+            "creator_id",
+            "executor_id",
+            "status",
+            name="unique_task_stat",
+        ),
+    )
+    creator_id: Mapped[int]
+    executor_id: Mapped[int]
+    status: Mapped[TaskStatus] = mapped_column(Enum(TaskStatus))
+    count: Mapped[int] = mapped_column(default=0)
+    overdue: Mapped[int] = mapped_column(default=0)
+
+
+class TaskStatDelta(Base):
+    """
+    Изменения счетчиков TaskStat, которые триггеры tasks и usertasksassociations
+    только добавляют: пишущие запросы не блокируют общие строки счетчиков.
+    Текущее значение счетчика - строка TaskStat плюс сумма его изменений.
+    """
+
+    creator_id: Mapped[int]
+    executor_id: Mapped[int]
+    status: Mapped[TaskStatus] = mapped_column(Enum(TaskStatus))
+    deadline: Mapped[date | None]
+    delta: Mapped[int]
+
+
+class TaskStatDay(Base):
+    """День, на который посчитан overdue в TaskStat; одна строка."""
+
+    as_of: Mapped[date]
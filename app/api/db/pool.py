@@ -0,0 +1,109 @@
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# ASGI scope текущего запроса; роутер дописывает в него найденный route
+request_scope: ContextVar[dict | None] = ContextVar("request_scope", default=None)
+
+
+def current_endpoint() -> str:
+    scope = request_scope.get()
+    if scope is None:
+        return "-"
+    route = scope.get("route")
+    path = route.path if route is not None else scope.get("path", "-")
+    return f"{scope.get('method', 'WS')} {path}"
+
+
+class PoolStats:
+    """Счетчики пула соединений текущего процесса."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.overflow_checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.held_count = Counter()
+        self.held_total = Counter()
+        self.held_max: dict[str, float] = {}
+
+    def record_wait(self, seconds: float):
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+
+    def record_held(self, endpoint: str, seconds: float):
+        self.held_count[endpoint] += 1
+        self.held_total[endpoint] += seconds
+        self.held_max[endpoint] = max(self.held_max.get(endpoint, 0.0), seconds)
+
+    def report(self) -> dict:
+        return {
+            "checkouts": self.checkouts,
+            "overflow_checkouts": self.overflow_checkouts,
+            "timeouts": self.timeouts,
+            "wait_ms": {
+                "mean": round(self.wait_total / self.checkouts * 1000, 3)
+                if self.checkouts
+                else 0,
+                "max": round(self.wait_max * 1000, 3),
+            },
+            "held_ms": {
+                endpoint: {
+                    "count": count,
+                    "mean": round(self.held_total[endpoint] / count * 1000, 3),
+                    "max": round(self.held_max[endpoint] * 1000, 3),
+                }
+                for endpoint, count in self.held_count.most_common()
+            },
+        }
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Пул, который замеряет ожидание соединения и выход за pool_size."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except TimeoutError:
+            self.stats.timeouts += 1
+            raise
+        finally:
+            self.stats.record_wait(time.perf_counter() - started)
+        if self.overflow() > 0:
+            self.stats.overflow_checkouts += 1
+        return connection
+
+    def report(self) -> dict:
+        return {
+            "size": self.size(),
+            "checked_in": self.checkedin(),
+            "checked_out": self.checkedout(),
+            "overflow": max(self.overflow(), 0),
+            **self.stats.report(),
+        }
+
+
+def instrument(pool: InstrumentedPool):
+    """Учет времени, которое соединение провело у каждого эндпоинта."""
+
+    @event.listens_for(pool, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        pool.stats.checkouts += 1
+        connection_record.info["checkout"] = (time.perf_counter(), current_endpoint())
+
+    @event.listens_for(pool, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        checkout = connection_record.info.pop("checkout", None)
+        if checkout is not None:
+            started, endpoint = checkout
+            pool.stats.record_held(endpoint, time.perf_counter() - started)
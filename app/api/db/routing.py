@@ -0,0 +1,26 @@
+from functools import wraps
+
+from fastapi.routing import APIRoute
+
+from app.api.db.database import release_sessions
+
+
+def _releasing(endpoint):
+    @wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            await release_sessions()
+
+    return wrapper
+
+
+class DBRoute(APIRoute):
+    """
+    Маршрут, который закрывает сессии БД сразу после эндпоинта: соединение
+    не держится, пока ответ сериализуется и отправляется.
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _releasing(endpoint), **kwargs)
@@ -1,14 +1,38 @@
+from typing import Literal
+
 import dotenv
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
+class PoolSettings(BaseModel):
+    SIZE: int = 5
+    OVERFLOW: int = 10
+    TIMEOUT: float = 30
+    RECYCLE: int = 1800
+    PREPING: bool = True
+    STATEMENTS: int = 100
+
+
 class PostgresqlSettings(BaseModel):
     PORT: int
     PASSWORD: str
     USER: str
     NAME: str
     HOST: str
+    POOL: PoolSettings = PoolSettings()
+    # реплики для чтения через запятую: "host" или "host:port",
+    # логин и БД как у основной
+    REPLICAS: list[str] = []
+    # сколько секунд после записи юзер читает с основной БД
+    STICKY: int = 5
+
+    @field_validator("REPLICAS", mode="before")
+    @classmethod
+    def split_replicas(cls, value):
+        if isinstance(value, str):
+            return [host.strip() for host in value.split(",") if host.strip()]
+        return value
 
 
 class AuthSettings(BaseModel):
@@ -20,10 +44,41 @@ class EmailSMTP(BaseModel):
     PASS: str
 
 
+class HashSettings(BaseModel):
+    WORKERS: int = 4
+    QUEUE: int = 64
+
+
+class WebSocketSettings(BaseModel):
+    QUEUE: int = 100
+    OVERFLOWS: int = 10
+
+
+class SSESettings(BaseModel):
+    HISTORY: int = 100
+    TOPICS: int = 10_000
+    TTL: int = 3600
+    PING: int = 15
+
+
+class L1CacheSettings(BaseModel):
+    SIZE: int = 1000
+    TTL: int = 30
+
+
+class PubSubSettings(BaseModel):
+    BACKEND: Literal["redis", "memory"] = "redis"
+
+
 class Settings(BaseSettings):
     DB: PostgresqlSettings
     AUTH: AuthSettings
     EMAIL: EmailSMTP
+    HASH: HashSettings = HashSettings()
+    WS: WebSocketSettings = WebSocketSettings()
+    PUBSUB: PubSubSettings = PubSubSettings()
+    SSE: SSESettings = SSESettings()
+    L1: L1CacheSettings = L1CacheSettings()
 
     model_config = SettingsConfigDict(
         env_file=dotenv.find_dotenv(".env"),
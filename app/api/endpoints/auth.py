@@ -1,3 +1,5 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
 import jwt
@@ -8,11 +10,11 @@ from passlib.context import CryptContext
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.db import User, get_db_session
+from app.api.db import DBRoute, User, get_db_session
 from app.api.db.settings_db import settings
 from app.api.schemas import DataToken, Token
 
-router = APIRouter(prefix="/auth", tags=["Auth"])
+router = APIRouter(prefix="/auth", tags=["Auth"], route_class=DBRoute)
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 SECRET_KEY = settings.AUTH.KEY
 ALGORITHM = "HS256"
@@ -23,6 +25,41 @@ def verify_password(non_hashed_pass, hashed_pass):
     return pwd_context.verify(non_hashed_pass, hashed_pass)
 
 
+class PasswordHasher:
+    """
+    Хэширование и проверка паролей bcrypt в пуле потоков, чтобы не блокировать
+    event loop. Очередь ограничена: при переполнении запрос получает 503.
+    """
+
+    def __init__(self, workers: int, queue: int):
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="bcrypt"
+        )
+        self.slots = asyncio.Semaphore(workers + queue)
+
+    async def _run(self, func, *args):
+        if self.slots.locked():
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many password hashing requests, try again later",
+            )
+        async with self.slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, func, *args)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(pwd_context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(pwd_context.verify, password, hashed_password)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+hasher = PasswordHasher(workers=settings.HASH.WORKERS, queue=settings.HASH.QUEUE)
+
+
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -59,7 +96,7 @@ async def login(
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="User does not exist"
         )
-    if not verify_password(userdetails.password, user.password):
+    if not await hasher.verify(userdetails.password, user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect password"
         )
@@ -0,0 +1,35 @@
+from fastapi import APIRouter, Depends
+from fastapi_cache import FastAPICache
+
+from app.api.core import cache_stats
+from app.api.db import DBRoute, UserRole, sessionmanager
+from app.api.endpoints.users_utils import check_role, get_current_user
+from app.api.schemas import CurrentUser
+
+router = APIRouter(prefix="/internal", tags=["Internal"], route_class=DBRoute)
+
+
+@router.get("/cache")
+@check_role(UserRole.ADMIN)
+async def get_cache_stats(user: CurrentUser = Depends(get_current_user)):
+    """
+    Статистика кэша эндпоинтов текущего воркера: попадания в L1 и L2,
+    промахи и занятая L1 память. Права доступа: админ.
+    """
+
+    return {
+        "endpoints": cache_stats.report(),
+        "l1": FastAPICache.get_backend().l1_usage(),
+    }
+
+
+@router.get("/db")
+@check_role(UserRole.ADMIN)
+async def get_db_pool_stats(user: CurrentUser = Depends(get_current_user)):
+    """
+    Состояние пула соединений текущего воркера: выдачи, ожидание,
+    выход за pool_size и время удержания соединения по эндпоинтам.
+    Права доступа: админ.
+    """
+
+    return sessionmanager.pool_stats()
@@ -0,0 +1,125 @@
+import json
+from datetime import date
+from enum import Enum
+
+from fastapi import HTTPException, status
+from fastapi_pagination.cursor import CursorPage, CursorParams, decode_cursor
+from sqlalchemy import and_, false, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def get_keyset_order(model, ordering: list[str] | None):
+    """
+    Колонки сортировки в формате order_by фильтров ("-created_at", "+name").
+    В конец добавляется id, чтобы порядок строк был однозначным.
+    """
+
+    order = []
+    for field_name in ordering or []:
+        column = getattr(model, field_name.replace("-", "").replace("+", ""))
+        order.append((column, field_name.startswith("-")))
+    if not any(column.key == "id" for column, _ in order):
+        order.append((model.id, False))
+    return order
+
+
+def _dump_value(value):
+    if isinstance(value, Enum):
+        return value.name
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def _load_value(column, value):
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if issubclass(python_type, Enum):
+        return python_type[value]
+    if issubclass(python_type, date):
+        return python_type.fromisoformat(value)
+    return value
+
+
+def encode_keyset_cursor(values) -> str:
+    return json.dumps([_dump_value(value) for value in values])
+
+
+def decode_keyset_cursor(order, cursor: str | None):
+    """Значения колонок сортировки последней строки предыдущей страницы."""
+
+    cursor = decode_cursor(cursor)
+    if cursor is None:
+        return None
+    try:
+        values = json.loads(cursor)
+        if len(values) != len(order):
+            raise ValueError("cursor does not match ordering")
+        return [_load_value(column, value) for (column, _), value in zip(order, values)]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor value"
+        )
+
+
+def _after(column, value, desc: bool):
+    """
+    Условие "строка идет после value" с учетом сортировки NULL-ов в Postgres:
+    при ASC они в конце, при DESC в начале.
+    """
+
+    nullable = getattr(column.expression, "nullable", True)
+    if value is None:
+        return column.is_not(None) if desc else false()
+    if desc:
+        return column < value
+    if nullable:
+        return or_(column > value, column.is_(None))
+    return column > value
+
+
+def keyset_where(order, values):
+    conditions = []
+    equals = []
+    for (column, desc), value in zip(order, values):
+        conditions.append(and_(*equals, _after(column, value, desc)))
+        equals.append(column.is_(None) if value is None else column == value)
+    return or_(*conditions)
+
+
+def apply_keyset(query, order, values, size: int):
+    """Сортировка, условие курсора и LIMIT выполняются на стороне БД."""
+
+    query = query.order_by(
+        *(column.desc() if desc else column.asc() for column, desc in order)
+    )
+    if values is not None:
+        query = query.where(keyset_where(order, values))
+    return query.limit(size + 1)
+
+
+async def paginate_keyset(
+    session: AsyncSession,
+    query,
+    model,
+    params: CursorParams,
+    ordering: list[str] | None = None,
+    transformer=None,
+):
+    """Страница keyset-пагинации для ORM-запроса по одной модели."""
+
+    order = get_keyset_order(model, ordering)
+    values = decode_keyset_cursor(order, params.cursor)
+    result = await session.execute(apply_keyset(query, order, values, params.size))
+    items = list(result.scalars().all())
+
+    next_page = None
+    if params.size and len(items) > params.size:
+        items = items[: params.size]
+        next_page = encode_keyset_cursor(
+            getattr(items[-1], column.key) for column, _ in order
+        )
+    if transformer is not None:
+        items = await transformer(items)
+    return CursorPage.create(items, params, next_=next_page)
@@ -1,64 +1,100 @@
-from fastapi import (APIRouter, BackgroundTasks, Depends, HTTPException,
-                     WebSocket, WebSocketException, status)
+from fastapi import (APIRouter, BackgroundTasks, Depends, Header,
+                     HTTPException, Query, WebSocket, WebSocketException,
+                     status)
+from fastapi.responses import StreamingResponse
 from fastapi.websockets import WebSocketDisconnect
-from fastapi_cache.decorator import cache
 from fastapi_filter import FilterDepends
 from fastapi_limiter.depends import RateLimiter
-from fastapi_pagination import Page, paginate
+from fastapi_pagination import Page, Params
+from fastapi_pagination.cursor import CursorPage, CursorParams
 from fastapi_pagination.utils import disable_installed_extensions_check
-from sqlalchemy import func, select
+from sqlalchemy import func, insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import aliased, joinedload
+from sqlalchemy.orm import aliased
 
-from app.api.core import websocket_, ws_manager
-from app.api.db import Task, UserRole, get_db_session
+from app.api.core import (CacheTag, RawJSONCoder, RawJSONResponse, Topic,
+                          cached, invalidate_tags, sse_manager, websocket_,
+                          ws_manager)
+from app.api.db import DBRoute, Task, TaskStatus, UserRole, get_db_session
 from app.api.db.models import User, UserTasksAssociation
 from app.api.endpoints.filter import TaskFilter
-from app.api.endpoints.tasks_utils import get_task_by_id, get_task_response
+from app.api.endpoints.tasks_utils import (get_executors, get_task_by_id,
+                                           get_task_response, get_task_stats,
+                                           get_tasks_cursor_json,
+                                           get_tasks_page_json,
+                                           search_tasks_json)
 from app.api.endpoints.users_utils import (check_role, check_role_for_status,
-                                           get_current_user,
-                                           get_user_with_token,
+                                           get_current_user, get_read_session,
+                                           get_user_with_token, read_session,
                                            send_email_async)
-from app.api.schemas import (CreateTaskSchema, SuccessResponse, TaskEvent,
-                             TaskResponse, TaskUpdatePartial)
+from app.api.schemas import (BulkCreateTaskSchema, CreateTaskSchema,
+                             SuccessResponse, TaskEvent, TaskResponse,
+                             TaskSearchPage, TaskStatsResponse,
+                             TaskUpdatePartial)
 
 disable_installed_extensions_check()
 
 
-router = APIRouter(prefix="/tasks", tags=["Tasks"])
+router = APIRouter(prefix="/tasks", tags=["Tasks"], route_class=DBRoute)
 
 
 @router.websocket("/ws/")
-async def websocket_endpoint_create_task(
-    websocket: WebSocket, session=Depends(get_db_session)
-):
-    await websocket_(websocket, session)
+async def websocket_endpoint_create_task(websocket: WebSocket):
+    await websocket_(websocket)
 
 
 @router.websocket("/ws/{task_id}")
-async def websocket_endpoint(
-    websocket: WebSocket, task_id: int, session=Depends(get_db_session)
-):
-    task = await get_task_by_id(task_id, session)
-    if not task:
-        raise WebSocketException(
-            code=status.HTTP_404_NOT_FOUND, reason="this task does not exist"
-        )
-    user = await get_user_with_token(websocket, session)
+async def websocket_endpoint(websocket: WebSocket, task_id: int):
+    # БД нужна только для проверки прав, соединение возвращается в пул
+    # до начала долгого цикла чтения сокета
+    async with read_session(websocket.headers.get("authorization")) as session:
+        task = await get_task_by_id(task_id, session)
+        if not task:
+            raise WebSocketException(
+                code=status.HTTP_404_NOT_FOUND, reason="this task does not exist"
+            )
+        user = await get_user_with_token(websocket, session)
     executors_id = [executor.user_id for executor in task.task_detail]
     if user.id == task.creator.id or user.id in executors_id:
-        await ws_manager.connect(task_id, websocket)
+        await ws_manager.connect(websocket, Topic.task(task_id))
         try:
             while True:
                 data = await websocket.receive_text()
 
         except WebSocketDisconnect as e:
-            await ws_manager.disconnect(task_id, websocket)
             print(f"Error: {e}")
         finally:
+            await ws_manager.disconnect(websocket)
             await websocket.close()
 
 
+@router.get("/sse/{task_id}")
+async def sse_endpoint(
+    task_id: int,
+    last_event_id: int | None = Header(default=None),
+    user=Depends(get_current_user),
+    session: AsyncSession = Depends(get_db_session),
+):
+    """
+    События таски через Server-Sent Events. Клиент, переподключившийся
+    с Last-Event-ID, получает пропущенные события из буфера; если их уже
+    нет, приходит событие resync и таску нужно перечитать.
+    """
+
+    task = await get_task_by_id(task_id, session)
+    executors_id = [executor.user_id for executor in task.task_detail]
+    if user.id != task.creator_id and user.id not in executors_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You do not have permission to perform the task",
+        )
+    return StreamingResponse(
+        sse_manager.stream([Topic.task(task_id), Topic.BROADCAST], last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post(
     "/create",
     status_code=status.HTTP_201_CREATED,
@@ -82,21 +118,20 @@ async def create_task(
         deadline=task_data.deadline,
     )
 
+    executors = await get_executors(task_data.executors_id, session)
+    if any(executor.role == UserRole.MANAGER for executor in executors):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You do not have permission to perform the task",
+        )
+
     session.add(new_task)
     await session.flush()
 
     list_user_tasks = []
-    for user_id in task_data.executors_id:
-        stmt = await session.execute(select(User).where(User.id == user_id))
-        executor = stmt.scalar_one_or_none()
-
-        if executor.role == UserRole.MANAGER:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="You do not have permission to perform the task",
-            )
+    for executor in executors:
         list_user_tasks.append(
-            UserTasksAssociation(user_id=user_id, task_id=new_task.id)
+            UserTasksAssociation(user_id=executor.id, task_id=new_task.id)
         )
 
         background_tasks.add_task(
@@ -108,9 +143,14 @@ async def create_task(
 
     session.add_all(list_user_tasks)
     await session.commit()
+    await invalidate_tags(
+        CacheTag.TASKS_LIST,
+        CacheTag.user(user.id),
+        *(CacheTag.user(executor.id) for executor in executors),
+    )
     for executor_id in task_data.executors_id:
         await ws_manager.send_message(
-            executor_id,
+            Topic.user(executor_id),
             message=TaskEvent(message=f"{user.username} create new task").model_dump(),
         )
     return {
@@ -119,44 +159,179 @@ async def create_task(
     }
 
 
+@router.post(
+    "/bulk",
+    status_code=status.HTTP_201_CREATED,
+    response_model=SuccessResponse,
+    dependencies=[Depends(RateLimiter(times=2, seconds=5))],
+)
+@check_role(UserRole.MANAGER)
+async def create_tasks_bulk(
+    tasks_data: BulkCreateTaskSchema,
+    background_tasks: BackgroundTasks,
+    user=Depends(get_current_user),
+    session: AsyncSession = Depends(get_db_session),
+):
+    """
+    Массовое создание тасок: исполнители проверяются одним запросом,
+    таски и связи с исполнителями вставляются многострочными INSERT-ами.
+    """
+
+    executors = {
+        executor.id: executor
+        for executor in await get_executors(
+            [
+                executor_id
+                for task_data in tasks_data.tasks
+                for executor_id in task_data.executors_id
+            ],
+            session,
+        )
+    }
+    if any(executor.role == UserRole.MANAGER for executor in executors.values()):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You do not have permission to perform the task",
+        )
+
+    result = await session.execute(
+        insert(Task).returning(Task.id, sort_by_parameter_order=True),
+        [
+            {
+                "name": task_data.name,
+                "description": task_data.description,
+                "urgency": task_data.urgency,
+                "creator_id": user.id,
+                "deadline": task_data.deadline,
+            }
+            for task_data in tasks_data.tasks
+        ],
+    )
+    tasks_id = result.scalars().all()
+    list_user_tasks = [
+        {"user_id": executor_id, "task_id": task_id}
+        for task_id, task_data in zip(tasks_id, tasks_data.tasks)
+        for executor_id in set(task_data.executors_id)
+    ]
+    if list_user_tasks:
+        await session.execute(insert(UserTasksAssociation), list_user_tasks)
+    await session.commit()
+    await invalidate_tags(
+        CacheTag.TASKS_LIST,
+        CacheTag.user(user.id),
+        *(CacheTag.user(executor_id) for executor_id in executors),
+    )
+
+    for task_data in tasks_data.tasks:
+        for executor_id in set(task_data.executors_id):
+            executor = executors[executor_id]
+            background_tasks.add_task(
+                send_email_async,
+                f"Created task {task_data.name}",
+                f"{executor.username} you have new task",
+                executor.email,
+            )
+    for executor_id in executors:
+        await ws_manager.send_message(
+            Topic.user(executor_id),
+            message=TaskEvent(message=f"{user.username} create new task").model_dump(),
+        )
+    return {
+        "status": TaskStatus.CREATED.name,
+        "message": f"{len(tasks_id)} tasks successfully created",
+    }
+
+
 @router.get(
     "/",
     response_model=Page[TaskResponse],
     dependencies=[Depends(RateLimiter(times=2, seconds=5))],
 )
-@cache(
-    expire=60,
-)
+@cached(CacheTag.TASKS_LIST, CacheTag.TASKS, coder=RawJSONCoder)
 async def get_all_tasks(
     task_filter: TaskFilter = FilterDepends(TaskFilter),
+    params: Params = Depends(),
     user=Depends(get_current_user),
-    session: AsyncSession = Depends(get_db_session),
+    session: AsyncSession = Depends(get_read_session),
 ):
-    """Получение всех тасок с возможностью фильтрации по полям."""
-    query = select(Task).options(
-        joinedload(Task.creator),
-        joinedload(Task.task_detail).joinedload(UserTasksAssociation.user),
-    )
+    """
+    Получение всех тасок с возможностью фильтрации по полям.
+    Страница собирается в JSON на стороне Postgres и отдается как есть.
+    """
 
-    query = task_filter.filter(query)
-    query = task_filter.apply_users_filter(query)
-    query = task_filter.sort(query)
+    return RawJSONResponse(await get_tasks_page_json(session, task_filter, params))
 
-    result = await session.execute(query)
-    tasks = result.scalars().unique()
-    list_of_tasks = []
-    for task in tasks:
-        task_data = await get_task_response(task)
-        list_of_tasks.append(task_data)
 
-    return paginate(list_of_tasks)
+@router.get(
+    "/cursor",
+    response_model=CursorPage[TaskResponse],
+    dependencies=[Depends(RateLimiter(times=2, seconds=5))],
+)
+@cached(CacheTag.TASKS_LIST, CacheTag.TASKS, coder=RawJSONCoder)
+async def get_tasks_cursor(
+    task_filter: TaskFilter = FilterDepends(TaskFilter),
+    params: CursorParams = Depends(),
+    user=Depends(get_current_user),
+    session: AsyncSession = Depends(get_read_session),
+):
+    """
+    Получение тасок с keyset-пагинацией: условие курсора и LIMIT
+    выполняются в БД, сортировка берется из order_by фильтра.
+    """
+
+    return RawJSONResponse(await get_tasks_cursor_json(session, task_filter, params))
 
 
-@router.get("/{task_id}", dependencies=[Depends(RateLimiter(times=2, seconds=5))])
-@cache(
-    expire=60,
+@router.get(
+    "/search",
+    response_model=TaskSearchPage,
+    dependencies=[Depends(RateLimiter(times=2, seconds=5))],
 )
-async def get_task_id(task_id: int, session: AsyncSession = Depends(get_db_session)):
+@cached(CacheTag.TASKS_LIST, CacheTag.TASKS, coder=RawJSONCoder)
+async def search_tasks(
+    q: str = Query(min_length=1, max_length=200),
+    task_filter: TaskFilter = FilterDepends(TaskFilter),
+    params: CursorParams = Depends(),
+    user=Depends(get_current_user),
+    session: AsyncSession = Depends(get_read_session),
+):
+    """
+    Полнотекстовый поиск тасок по названию и описанию (синтаксис запроса
+    как в поисковиках: "фраза", -слово, or). Совпадение в названии весит
+    больше, чем в описании; результаты отсортированы по релевантности,
+    найденные слова подсвечены в highlight. Комбинируется с фильтрами
+    тасок, order_by игнорируется. Ранжируются только самые новые совпадения,
+    если их больше, в ответе truncated = true.
+    """
+
+    return RawJSONResponse(await search_tasks_json(session, q, task_filter, params))
+
+
+@router.get(
+    "/stats",
+    response_model=TaskStatsResponse,
+    dependencies=[Depends(RateLimiter(times=2, seconds=5))],
+)
+@check_role(UserRole.ADMIN, UserRole.MANAGER)
+async def get_tasks_stats(
+    creator_id: int | None = None,
+    user=Depends(get_current_user),
+    session: AsyncSession = Depends(get_db_session),
+):
+    """
+    Статистика тасок: количество по статусам, открытые и просроченные
+    таски, нагрузка каждого исполнителя. Менеджер видит статистику своих
+    тасок, админ - тасок creator_id или всех. Права доступа: админ, менеджер.
+    """
+
+    if user.role == UserRole.MANAGER:
+        creator_id = user.id
+    return await get_task_stats(session, creator_id)
+
+
+@router.get("/{task_id}", dependencies=[Depends(RateLimiter(times=2, seconds=5))])
+@cached(CacheTag.task("{task_id}"), CacheTag.TASKS, coder=RawJSONCoder)
+async def get_task_id(task_id: int, session: AsyncSession = Depends(get_read_session)):
     """Получение таски по айди с информацией о создателе задачи и исполнителе/исполнителях."""
 
     task = await get_task_by_id(task_id, session)
@@ -177,11 +352,23 @@ async def delete_task_id(
     )
     task = result.scalar_one_or_none()
     if task:
+        executors_id = await session.scalars(
+            select(UserTasksAssociation.user_id).where(
+                UserTasksAssociation.task_id == task.id
+            )
+        )
+        executors_tags = [CacheTag.user(user_id) for user_id in executors_id]
         await session.delete(task)
         await session.commit()
+        await invalidate_tags(
+            CacheTag.task(task.id),
+            CacheTag.TASKS_LIST,
+            CacheTag.user(user.id),
+            *executors_tags,
+        )
 
         await ws_manager.send_message(
-            task.id,
+            Topic.task(task.id),
             message=TaskEvent(
                 event="delete task",
                 message=f"Manager {user.username} delete the task #{task.id}",
@@ -215,15 +402,11 @@ async def update_task(
     executors_id = [executor.user_id for executor in task.task_detail]
 
     if task_data.executors_id:
-        stmt_user = await session.execute(
-            select(User).where(User.role == UserRole.USER)
-        )
-        res = [user.id for user in stmt_user.scalars()]
-        for executor_id in task_data.executors_id:
-            if executor_id not in res:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
-                )
+        executors = await get_executors(task_data.executors_id, session)
+        if any(executor.role != UserRole.USER for executor in executors):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+            )
 
     if user.role == UserRole.USER:
         if (
@@ -250,9 +433,18 @@ async def update_task(
             setattr(task, name, value)
 
     await session.commit()
+    await invalidate_tags(
+        CacheTag.task(task.id),
+        CacheTag.TASKS_LIST,
+        CacheTag.user(task.creator_id),
+        *(
+            CacheTag.user(user_id)
+            for user_id in {*executors_id, *(task_data.executors_id or [])}
+        ),
+    )
 
     await ws_manager.send_message(
-        task.id,
+        Topic.task(task.id),
         message=TaskEvent(
             event="update task",
             message=f"{user.username} update the task #{task.id}",
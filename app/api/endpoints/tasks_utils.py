@@ -1,15 +1,35 @@
+import json
+
 from fastapi import HTTPException, status
-from sqlalchemy import select
+from fastapi_pagination import Params
+from fastapi_pagination.cursor import CursorParams, encode_cursor
+from fastapi_pagination.ext.sqlalchemy import count_query, paginate_query
+from sqlalchemy import (REAL, String, Text, case, cast, func, literal, select,
+                        union_all)
+from sqlalchemy.dialects.postgresql import (JSONB, ts_headline,
+                                            websearch_to_tsquery)
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import aliased, joinedload
 
-from app.api.db import Task
-from app.api.db.models import UserTasksAssociation
-from app.api.schemas import TaskCreator, TaskExecutor, TaskResponse
+from app.api.db import Task, TaskStatus, User
+from app.api.db.models import (SEARCH_CONFIG, TaskStat, TaskStatDay,
+                               TaskStatDelta, UserTasksAssociation)
+from app.api.endpoints.filter import TaskFilter
+from app.api.endpoints.pagination import (apply_keyset, decode_keyset_cursor,
+                                          encode_keyset_cursor,
+                                          get_keyset_order)
+from app.api.schemas import (TaskCreator, TaskExecutor, TaskResponse,
+                             TaskStatsResponse)
 
+# закрытые таски не считаются в нагрузке исполнителей и просрочке
+CLOSED_STATUSES = (TaskStatus.FINISHED, TaskStatus.CANCEL)
+# сколько последних найденных тасок ранжирует поиск: ts_rank читает
+# search_vector каждой строки, и без предела частое слово ранжирует всю таблицу
+SEARCH_CANDIDATES = 1000
 
-async def get_task_by_id(task_id: int, session: AsyncSession):
-    result = await session.execute(
+
+def task_by_id_query(task_id: int):
+    return (
         select(Task)
         .options(
             joinedload(Task.creator),
@@ -17,6 +37,10 @@ async def get_task_by_id(task_id: int, session: AsyncSession):
         )
         .where(Task.id == task_id)
     )
+
+
+async def get_task_by_id(task_id: int, session: AsyncSession):
+    result = await session.execute(task_by_id_query(task_id))
     task = result.scalars().first()
     if not task:
         raise HTTPException(
@@ -25,6 +49,21 @@ async def get_task_by_id(task_id: int, session: AsyncSession):
     return task
 
 
+async def get_executors(executors_id: list[int], session: AsyncSession):
+    """Исполнители таски одним запросом. Если кого-то из них нет, 404."""
+
+    executors_id = set(executors_id)
+    if not executors_id:
+        return []
+    result = await session.execute(select(User).where(User.id.in_(executors_id)))
+    executors = result.scalars().all()
+    if len(executors) != len(executors_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+        )
+    return executors
+
+
 async def get_task_response(task):
     task_data = TaskResponse(
         id=task.id,
@@ -51,3 +90,328 @@ async def get_task_response(task):
         ],
     )
     return task_data
+
+
+def task_json_object():
+    """
+    JSON таски в формате TaskResponse, собираемый в Postgres.
+    Создатель и исполнители берутся коррелированными подзапросами,
+    поэтому строки тасок не размножаются джойнами.
+    """
+
+    creator = aliased(User, name="json_creator")
+    executor = aliased(User, name="json_executor")
+    association = aliased(UserTasksAssociation, name="json_association")
+
+    creator_json = (
+        select(
+            func.json_build_object(
+                "id", creator.id, "username", creator.username, "email", creator.email
+            )
+        )
+        .where(creator.id == Task.creator_id)
+        .correlate(Task)
+        .scalar_subquery()
+    )
+    executors_json = (
+        select(
+            func.json_agg(
+                func.json_build_object(
+                    "id",
+                    executor.id,
+                    "username",
+                    executor.username,
+                    "email",
+                    executor.email,
+                )
+            )
+        )
+        .select_from(association)
+        .join(executor, executor.id == association.user_id)
+        .where(association.task_id == Task.id)
+        .correlate(Task)
+        .scalar_subquery()
+    )
+    task_status = case(
+        {task_status: task_status.value for task_status in TaskStatus},
+        value=Task.status,
+    )
+    return func.json_build_object(
+        "id",
+        Task.id,
+        "name",
+        Task.name,
+        "description",
+        Task.description,
+        "created_at",
+        Task.created_at,
+        "deadline",
+        Task.deadline,
+        "urgency",
+        Task.urgency,
+        "status",
+        task_status,
+        "creator",
+        func.coalesce(
+            creator_json,
+            func.to_json(cast(literal("Creator will be add soon"), String)),
+        ),
+        "executors",
+        func.coalesce(executors_json, func.json_build_array()),
+    )
+
+
+def task_json():
+    return cast(task_json_object(), Text)
+
+
+def filter_tasks(query, task_filter: TaskFilter):
+    query = task_filter.filter(query)
+    return task_filter.apply_users_filter(query)
+
+
+def build_page_json(items: list[str], **fields) -> bytes:
+    """Тело страницы из готовых JSON-строк тасок, без разбора и валидации."""
+
+    meta = json.dumps(fields, separators=(",", ":"))
+    return f'{{"items":[{",".join(items)}],{meta[1:]}'.encode()
+
+
+def tasks_page_query(task_filter: TaskFilter, params: Params):
+    query = filter_tasks(select(task_json()), task_filter)
+    # id в конце сортировки: без уникального ключа LIMIT/OFFSET страницы
+    # могут повторять и пропускать строки
+    return paginate_query(task_filter.sort(query).order_by(Task.id), params)
+
+
+def tasks_count_query(task_filter: TaskFilter):
+    return count_query(filter_tasks(select(Task.id), task_filter))
+
+
+def tasks_cursor_query(task_filter: TaskFilter, order, values, size: int):
+    query = filter_tasks(
+        select(task_json(), *(column for column, _ in order)), task_filter
+    )
+    return apply_keyset(query, order, values, size)
+
+
+async def get_tasks_page_json(
+    session: AsyncSession, task_filter: TaskFilter, params: Params
+) -> bytes:
+    """Страница тасок (Page[TaskResponse]) в виде JSON, собранного в Postgres."""
+
+    items = (await session.scalars(tasks_page_query(task_filter, params))).all()
+    total = await session.scalar(tasks_count_query(task_filter))
+    return build_page_json(
+        items,
+        total=total,
+        page=params.page,
+        size=params.size,
+        pages=-(-total // params.size),
+    )
+
+
+async def get_tasks_cursor_json(
+    session: AsyncSession, task_filter: TaskFilter, params: CursorParams
+) -> bytes:
+    """Страница тасок (CursorPage[TaskResponse]) в виде JSON, собранного в Postgres."""
+
+    order = get_keyset_order(Task, task_filter.ordering_values)
+    values = decode_keyset_cursor(order, params.cursor)
+    rows = (
+        await session.execute(
+            tasks_cursor_query(task_filter, order, values, params.size)
+        )
+    ).all()
+    return build_cursor_page_json(rows, params.size)
+
+
+def build_cursor_page_json(rows, size: int, **fields) -> bytes:
+    """
+    Тело CursorPage из строк (JSON таски, значения колонок сортировки...).
+    Запрос выбирает на одну строку больше страницы, чтобы узнать о следующей.
+    """
+
+    next_page = None
+    if size and len(rows) > size:
+        rows = rows[:size]
+        next_page = encode_cursor(encode_keyset_cursor(rows[-1][1:]))
+    return build_page_json(
+        [row[0] for row in rows],
+        total=None,
+        current_page=None,
+        current_page_backwards=None,
+        previous_page=None,
+        next_page=next_page,
+        **fields,
+    )
+
+
+def search_order(search: str):
+    """Сортировка поиска: по релевантности, при равной - по убыванию id."""
+
+    rank = func.ts_rank(
+        Task.search_vector, websearch_to_tsquery(SEARCH_CONFIG, search), type_=REAL
+    )
+    return [(rank, True), (Task.id, True)]
+
+
+def tasks_search_query(
+    search: str, task_filter: TaskFilter, order, values, size: int, bound=None
+):
+    """
+    Поиск по search_vector. Ранжируются только SEARCH_CANDIDATES самых новых
+    совпадений: редкое слово Postgres находит по GIN-индексу, частое - обходом
+    первичного ключа с конца, и в обоих случаях ts_rank считается не больше
+    чем для SEARCH_CANDIDATES строк. Если совпадений больше, truncated
+    истинно, а более старые совпадения в выдачу не попадают.
+
+    bound - наибольший id кандидатов первой страницы: следующие страницы
+    ранжируют те же кандидаты, и новые таски их не сдвигают. Строки:
+    JSON таски, ранг, id, bound, truncated.
+    """
+
+    tsquery = websearch_to_tsquery(SEARCH_CONFIG, search)
+    (rank, _), _ = order
+    candidates = filter_tasks(
+        select(Task.id).where(Task.search_vector.bool_op("@@")(tsquery)),
+        task_filter,
+    )
+    if bound is not None:
+        candidates = candidates.where(Task.id <= bound)
+    # на одного кандидата больше, чтобы узнать, что совпадений больше предела
+    candidates = (
+        candidates.order_by(Task.id.desc())
+        .limit(SEARCH_CANDIDATES + 1)
+        .subquery("candidates")
+    )
+    pool = select(
+        candidates.c.id,
+        func.row_number().over(order_by=candidates.c.id.desc()).label("n"),
+        func.max(candidates.c.id).over().label("bound"),
+        (func.count().over() > SEARCH_CANDIDATES).label("truncated"),
+    ).subquery("pool")
+    matches = (
+        select(Task.id, rank.label("rank"), pool.c.bound, pool.c.truncated)
+        .join(pool, pool.c.id == Task.id)
+        .where(pool.c.n <= SEARCH_CANDIDATES)
+    )
+    page = apply_keyset(matches, order, values, size).subquery("matches")
+
+    highlight = func.jsonb_build_object(
+        "name",
+        ts_headline(SEARCH_CONFIG, Task.name, tsquery, "HighlightAll=true"),
+        "description",
+        ts_headline(
+            SEARCH_CONFIG,
+            func.coalesce(Task.description, ""),
+            tsquery,
+            "MaxFragments=2, MaxWords=20, MinWords=5",
+        ),
+    )
+    item = cast(task_json_object(), JSONB).op("||")(
+        func.jsonb_build_object("rank", page.c.rank, "highlight", highlight)
+    )
+    return (
+        select(cast(item, Text), page.c.rank, page.c.id, page.c.bound, page.c.truncated)
+        .select_from(page.join(Task, Task.id == page.c.id))
+        .order_by(page.c.rank.desc(), page.c.id.desc())
+    )
+
+
+async def search_tasks_json(
+    session: AsyncSession, search: str, task_filter: TaskFilter, params: CursorParams
+) -> bytes:
+    """Страница поиска (TaskSearchPage) в виде JSON из Postgres."""
+
+    order = search_order(search)
+    # в курсоре после значений сортировки лежит граница кандидатов
+    cursor = decode_keyset_cursor([*order, (Task.id, True)], params.cursor)
+    values, bound = (cursor[:-1], cursor[-1]) if cursor else (None, None)
+    rows = (
+        await session.execute(
+            tasks_search_query(search, task_filter, order, values, params.size, bound)
+        )
+    ).all()
+    return build_cursor_page_json(
+        [row[:-1] for row in rows],
+        params.size,
+        truncated=bool(rows) and rows[0][-1],
+    )
+
+
+async def get_task_stats(
+    session: AsyncSession, creator_id: int | None
+) -> TaskStatsResponse:
+    """
+    Статистика тасок создателя (или всех тасок) из счетчиков taskstats:
+    читается по строке на исполнителя и статус, а не по строке на таску.
+    """
+
+    # изменения от триггеров переносятся в taskstats, при смене дня
+    # пересчитывается overdue; если переносит другой запрос, сразу выходит
+    await session.execute(select(func.task_stats_compact()))
+    await session.commit()
+
+    # счетчик - строка taskstats плюс еще не перенесенные изменения
+    day = select(TaskStatDay.as_of).scalar_subquery()
+    counters = union_all(
+        select(
+            TaskStat.creator_id,
+            TaskStat.executor_id,
+            TaskStat.status,
+            TaskStat.count,
+            TaskStat.overdue,
+        ),
+        select(
+            TaskStatDelta.creator_id,
+            TaskStatDelta.executor_id,
+            TaskStatDelta.status,
+            TaskStatDelta.delta,
+            case((TaskStatDelta.deadline < day, TaskStatDelta.delta), else_=0),
+        ),
+    ).subquery("counters")
+    query = (
+        select(
+            counters.c.executor_id,
+            counters.c.status,
+            func.sum(counters.c.count),
+            func.sum(counters.c.overdue),
+        )
+        .group_by(counters.c.executor_id, counters.c.status)
+        .having(func.sum(counters.c.count) != 0)
+    )
+    if creator_id is not None:
+        query = query.where(counters.c.creator_id == creator_id)
+    rows = (await session.execute(query)).all()
+
+    executors_id = {executor_id for executor_id, *_ in rows if executor_id}
+    usernames = {}
+    if executors_id:
+        result = await session.execute(
+            select(User.id, User.username).where(User.id.in_(executors_id))
+        )
+        usernames = dict(result.all())
+
+    stats = {}
+    for executor_id, task_status, count, overdue in rows:
+        entry = stats.setdefault(
+            executor_id, {"open": 0, "overdue": 0, "by_status": {}}
+        )
+        entry["by_status"][task_status] = count
+        if task_status not in CLOSED_STATUSES:
+            entry["open"] += count
+            entry["overdue"] += overdue
+
+    tasks = stats.pop(0, {"open": 0, "overdue": 0, "by_status": {}})
+    return TaskStatsResponse(
+        total=sum(tasks["by_status"].values()),
+        **tasks,
+        executors=sorted(
+            (
+                {"id": executor_id, "username": usernames.get(executor_id), **entry}
+                for executor_id, entry in stats.items()
+            ),
+            key=lambda executor: -executor["open"],
+        ),
+    )
@@ -1,35 +1,48 @@
 from fastapi import APIRouter, Depends, HTTPException, WebSocket, status
-from fastapi_cache.decorator import cache
 from fastapi_filter import FilterDepends
 from fastapi_limiter.depends import RateLimiter
-from fastapi_pagination import Page, paginate
-from passlib.context import CryptContext
+from fastapi_pagination import Page, Params
+from fastapi_pagination.cursor import CursorPage, CursorParams
+from fastapi_pagination.ext.sqlalchemy import paginate
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
 
-from app.api.core import websocket_, ws_manager
-from app.api.db import User, UserRole, get_db_session
+from app.api.core import (CacheTag, RawJSONCoder, cached, invalidate_tags,
+                          websocket_, ws_manager)
+from app.api.db import DBRoute, User, UserRole, get_db_session
 from app.api.db.models import UserTasksAssociation
+from app.api.endpoints.auth import hasher, pwd_context
 from app.api.endpoints.filter import UserFilter
-from app.api.endpoints.users_utils import check_role, get_current_user
+from app.api.endpoints.pagination import paginate_keyset
+from app.api.endpoints.users_utils import (check_role, get_current_user,
+                                           get_read_session,
+                                           invalidate_principal)
 from app.api.schemas import (CreateUserSchema, TaskEvent, TaskInWork,
                              TaskUserResponse, UserResponse, UsersAllSchemas,
                              UserUpdatePartial)
 
-router = APIRouter(prefix="/users", tags=["Users"])
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+router = APIRouter(prefix="/users", tags=["Users"], route_class=DBRoute)
 
 
 def hash_pass(password: str):
     return pwd_context.hash(password)
 
 
+async def get_users_without_passwords(users):
+    return [
+        {
+            column.name: getattr(user, column.name)
+            for column in user.__table__.columns
+            if column.name != "password"
+        }
+        for user in users
+    ]
+
+
 @router.websocket("/ws/")
-async def websocket_endpoint_users(
-    websocket: WebSocket, session=Depends(get_db_session)
-):
-    await websocket_(websocket, session)
+async def websocket_endpoint_users(websocket: WebSocket):
+    await websocket_(websocket)
 
 
 @router.post(
@@ -42,7 +55,7 @@ async def create_user(
 ):
     """Создание аккаунта юзера."""
 
-    hashed_pass = hash_pass(user_in.password)
+    hashed_pass = await hasher.hash(user_in.password)
 
     user = User(
         email=user_in.email,
@@ -52,16 +65,13 @@ async def create_user(
     session.add(user)
     await session.commit()
     await session.refresh(user)
-    query = await session.execute(select(User))
-    users = query.scalars().all()
-    for client in users:
-        await ws_manager.send_message(
-            client.id,
-            message=TaskEvent(
-                event="new user added",
-                message=f"new user {user.username} added",
-            ).model_dump(),
-        )
+    await invalidate_tags(CacheTag.USERS_LIST)
+    await ws_manager.broadcast(
+        TaskEvent(
+            event="new user added",
+            message=f"new user {user.username} added",
+        ).model_dump()
+    )
     return user
 
 
@@ -70,12 +80,11 @@ async def create_user(
     response_model=Page[UsersAllSchemas],
     dependencies=[Depends(RateLimiter(times=2, seconds=5))],
 )
-@cache(
-    expire=60,
-)
+@cached(CacheTag.USERS_LIST, CacheTag.USERS)
 async def get_users(
-    session: AsyncSession = Depends(get_db_session),
+    session: AsyncSession = Depends(get_read_session),
     user_filter: UserFilter = FilterDepends(UserFilter),
+    params: Params = Depends(),
 ):
     """
     Получение списка всех юзеров с краткой информацией и
@@ -84,20 +93,39 @@ async def get_users(
 
     query = select(User)
     query = user_filter.filter(query)
-    query = user_filter.sort(query)
-    stmt = await session.execute(query)
-    users = stmt.scalars().all()
-    users_without_passwords = []
+    query = user_filter.sort(query).order_by(User.id)
 
-    for user in users:
-        user_data = {
-            column.name: getattr(user, column.name)
-            for column in user.__table__.columns
-            if column.name != "password"
-        }
-        users_without_passwords.append(user_data)
+    return await paginate(
+        session, query, params, transformer=get_users_without_passwords
+    )
 
-    return paginate(users_without_passwords)
+
+@router.get(
+    "/all/cursor",
+    response_model=CursorPage[UsersAllSchemas],
+    dependencies=[Depends(RateLimiter(times=2, seconds=5))],
+)
+@cached(CacheTag.USERS_LIST, CacheTag.USERS)
+async def get_users_cursor(
+    session: AsyncSession = Depends(get_read_session),
+    user_filter: UserFilter = FilterDepends(UserFilter),
+    params: CursorParams = Depends(),
+):
+    """
+    Получение списка юзеров с keyset-пагинацией: условие курсора и LIMIT
+    выполняются в БД, сортировка берется из order_by фильтра.
+    """
+
+    query = user_filter.filter(select(User))
+
+    return await paginate_keyset(
+        session,
+        query,
+        User,
+        params,
+        ordering=user_filter.ordering_values,
+        transformer=get_users_without_passwords,
+    )
 
 
 @router.get("/me", dependencies=[Depends(RateLimiter(times=2, seconds=5))])
@@ -109,10 +137,10 @@ async def get_me(user: User = Depends(get_current_user)):
 
 
 @router.get("/{user_id}", dependencies=[Depends(RateLimiter(times=2, seconds=5))])
-@cache(
-    expire=60,
-)
-async def get_user_by_id(user_id: int, session: AsyncSession = Depends(get_db_session)):
+@cached(CacheTag.user("{user_id}"), CacheTag.USERS, coder=RawJSONCoder)
+async def get_user_by_id(
+    user_id: int, session: AsyncSession = Depends(get_read_session)
+):
     """Получение информации о юзере с тасками, в которых он является исполнителем или создателем."""
 
     res = await session.execute(
@@ -162,16 +190,17 @@ async def user_delete(
     user_del = stmt.scalar_one_or_none()
     await session.delete(user_del)
     await session.commit()
-    query = await session.execute(select(User))
-    users = query.scalars().all()
-    for client in users:
-        await ws_manager.send_message(
-            client.id,
-            message=TaskEvent(
-                event="user deleted",
-                message=f"user {user_del.username} has been deleted",
-            ).model_dump(),
-        )
+    await invalidate_principal(user_del.id)
+    # юзер есть и в тасках: создатель или исполнитель
+    await invalidate_tags(
+        CacheTag.user(user_del.id), CacheTag.USERS_LIST, CacheTag.TASKS
+    )
+    await ws_manager.broadcast(
+        TaskEvent(
+            event="user deleted",
+            message=f"user {user_del.username} has been deleted",
+        ).model_dump()
+    )
     return {"message": f"{user_del.username} successfully deleted"}
 
 
@@ -206,8 +235,12 @@ async def change_user(
                 user_update.role = value
                 continue
         if name == "password":
-            value = hash_pass(value)
+            value = await hasher.hash(value)
 
         setattr(user_update, name, value)
     await session.commit()
+    await invalidate_principal(user_update.id)
+    await invalidate_tags(
+        CacheTag.user(user_update.id), CacheTag.USERS_LIST, CacheTag.TASKS
+    )
     return "user update"
@@ -1,24 +1,118 @@
+import asyncio
+import contextlib
+from contextvars import ContextVar
 from email.message import EmailMessage
 from functools import wraps
 
 import aiosmtplib
-from fastapi import (Depends, HTTPException, WebSocket, WebSocketException,
-                     status)
+from fastapi import (Depends, HTTPException, Request, WebSocket,
+                     WebSocketException, status)
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy import select
+from fastapi.security.utils import get_authorization_scheme_param
+from sqlalchemy import event, select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 
-from app.api.db import TaskStatus, User, UserRole, get_db_session
+from app.api.core.pubsub import pubsub
+from app.api.core.ttl_cache import TTLCache
+from app.api.db import (TaskStatus, User, UserRole, get_db_session,
+                        sessionmanager)
+from app.api.db.database import track_session
 from app.api.db.settings_db import settings
 from app.api.endpoints.auth import verify_access_token
+from app.api.schemas import CurrentUser
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login/")
+PRINCIPAL_CACHE_SIZE = 10_000
+PRINCIPAL_CACHE_TTL = 60
+PRINCIPAL_INVALIDATE_CHANNEL = "principal-invalidate"
+STICKY_CHANNEL = "db-sticky"
+
+principal_cache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+# юзеры, которые недавно писали в БД: их чтения идут в основную БД,
+# пока реплики не догонят их изменения
+sticky_users = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=settings.DB.STICKY)
+# юзер текущего запроса
+current_user_id: ContextVar[int | None] = ContextVar("current_user_id", default=None)
+_background: set[asyncio.Task] = set()
+
+
+async def _drop_principal(user_id: str):
+    principal_cache.delete(int(user_id))
+
+
+pubsub.subscribe(PRINCIPAL_INVALIDATE_CHANNEL, _drop_principal)
+
+
+async def _stick(user_id: str):
+    sticky_users.set(int(user_id), True)
+
+
+pubsub.subscribe(STICKY_CHANNEL, _stick)
+
+
+@event.listens_for(Session, "after_commit")
+def _stick_writer(session: Session):
+    """После коммита юзера его чтения на всех воркерах идут в основную БД."""
+
+    user_id = current_user_id.get()
+    if user_id is None or not settings.DB.REPLICAS:
+        return
+    sticky_users.set(user_id, True)
+    task = asyncio.get_running_loop().create_task(
+        pubsub.publish(STICKY_CHANNEL, str(user_id))
+    )
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+def _token_user_id(authorization: str | None) -> int | None:
+    scheme, token = get_authorization_scheme_param(authorization)
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return verify_access_token(
+            token=token, credentials_exception=HTTPException(status_code=401)
+        ).id
+    except HTTPException:
+        return None
+
+
+@contextlib.asynccontextmanager
+async def read_session(authorization: str | None):
+    """
+    Сессия для чтения: на реплике, а для юзера, который только что
+    писал в БД, - на основной БД, чтобы он видел свои изменения.
+    """
+
+    user_id = _token_user_id(authorization) if settings.DB.REPLICAS else None
+    if user_id is not None and sticky_users.get(user_id):
+        async with sessionmanager.session() as session:
+            yield session
+    else:
+        async with sessionmanager.read_session() as session:
+            yield session
+
+
+async def get_read_session(request: Request):
+    async with read_session(request.headers.get("authorization")) as session:
+        track_session(session)
+        yield session
+
+
+async def invalidate_principal(user_id: int):
+    """Сброс закэшированного юзера во всех воркерах после его изменения."""
+
+    await pubsub.publish(PRINCIPAL_INVALIDATE_CHANNEL, str(user_id))
 
 
 async def get_current_user(
     token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(get_db_session)
 ):
-    """Получение текущего юзера."""
+    """
+    Получение текущего юзера. Данные юзера кэшируются в памяти процесса,
+    чтобы не ходить в БД на каждый запрос.
+    """
 
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -28,9 +122,23 @@ async def get_current_user(
     token = verify_access_token(
         token=token, credentials_exception=credentials_exception
     )
+    current_user_id.set(token.id)
+    user = principal_cache.get(token.id)
+    if user is not None:
+        return user
+
+    idle = not session.in_transaction()
     stmt = select(User).where(token.id == User.id)
     result = await session.execute(stmt)
     user = result.scalar_one_or_none()
+    if idle:
+        # соединение нужно только на этот запрос: возвращаем его в пул,
+        # эндпоинт возьмет новое, если ему понадобится БД
+        await session.close()
+    if user is None:
+        return None
+    user = CurrentUser.model_validate(user)
+    principal_cache.set(user.id, user)
     return user
 
 
@@ -40,7 +148,7 @@ def check_role(*roles):
     def decorator(func):
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            user: User = kwargs.get("user")
+            user: CurrentUser = kwargs.get("user")
             if user.role not in roles:
                 raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN,
@@ -53,7 +161,7 @@ def check_role(*roles):
     return decorator
 
 
-async def check_role_for_status(user: User):
+async def check_role_for_status(user: CurrentUser):
     """Проверка доступных статусов для юзеров и менеджеров."""
 
     status_for_user = {
@@ -1,11 +1,16 @@
 __all__ = (
     "CreateUserSchema",
+    "CurrentUser",
     "Token",
     "DataToken",
     "CreateTaskSchema",
+    "BulkCreateTaskSchema",
     "SuccessResponse",
     "TaskUpdatePartial",
     "TaskResponse",
+    "TaskSearchResponse",
+    "TaskSearchPage",
+    "TaskStatsResponse",
     "TaskCreator",
     "TaskExecutor",
     "TaskUserResponse",
@@ -16,9 +21,10 @@ __all__ = (
     "UsersAllSchemas",
 )
 
-from .task import (CreateTaskSchema, SuccessResponse, TaskCreator,
-                   TaskExecutor, TaskInWork, TaskResponse, TaskUpdatePartial,
-                   TaskUserResponse)
-from .user import (CreateUserSchema, DataToken, Token, UserResponse,
-                   UsersAllSchemas, UserUpdatePartial)
+from .task import (BulkCreateTaskSchema, CreateTaskSchema, SuccessResponse,
+                   TaskCreator, TaskExecutor, TaskInWork, TaskResponse,
+                   TaskSearchPage, TaskSearchResponse, TaskStatsResponse,
+                   TaskUpdatePartial, TaskUserResponse)
+from .user import (CreateUserSchema, CurrentUser, DataToken, Token,
+                   UserResponse, UsersAllSchemas, UserUpdatePartial)
 from .websockets import TaskEvent
@@ -1,5 +1,6 @@
 from datetime import date
 
+from fastapi_pagination.cursor import CursorPage
 from pydantic import BaseModel, ConfigDict, Field, field_validator
 
 from app.api.db import TaskStatus
@@ -21,6 +22,10 @@ class CreateTaskSchema(BaseModel):
     normalize_description = field_validator("description")(normalize)
 
 
+class BulkCreateTaskSchema(BaseModel):
+    tasks: list[CreateTaskSchema] = Field(min_length=1, max_length=1000)
+
+
 class SuccessResponse(BaseModel):
     status: str
     message: str
@@ -61,6 +66,37 @@ class TaskResponse(BaseModel):
     executors: list[TaskExecutor]
 
 
+class TaskHighlight(BaseModel):
+    name: str
+    description: str
+
+
+class TaskSearchResponse(TaskResponse):
+    rank: float
+    highlight: TaskHighlight
+
+
+class TaskSearchPage(CursorPage[TaskSearchResponse]):
+    # совпадений больше, чем ранжирует поиск: в выдаче только самые новые
+    truncated: bool = False
+
+
+class ExecutorStats(BaseModel):
+    id: int
+    username: str | None
+    open: int
+    overdue: int
+    by_status: dict[TaskStatus, int]
+
+
+class TaskStatsResponse(BaseModel):
+    total: int
+    open: int
+    overdue: int
+    by_status: dict[TaskStatus, int]
+    executors: list[ExecutorStats]
+
+
 class TaskInWork(BaseModel):
     id: int
     name: str
@@ -46,6 +46,15 @@ class UserSchema(UserBaseSchema):
     model_config = ConfigDict(from_attributes=True)
 
 
+class CurrentUser(BaseModel):
+    model_config = ConfigDict(from_attributes=True, frozen=True)
+
+    id: int
+    username: str
+    email: str
+    role: UserRole
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -0,0 +1,302 @@
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import subprocess
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+
+import httpx
+import websockets
+
+from benchmarks.utils import percentile
+
+TASK_FILTERS = [
+    {},
+    {"order_by": "-created_at"},
+    {"status": "at work"},
+    {"name__ilike": "%Task 1%"},
+    {"status": "created", "order_by": "deadline"},
+]
+MANAGER_STATUSES = ["frozen", "cancel", "finished"]
+
+
+def summarize(
+    name: str,
+    latencies: list,
+    statuses: Counter,
+    elapsed: float,
+    errors: int | None = None,
+):
+    latencies_ms = [latency * 1000 for latency in latencies]
+    requests = sum(statuses.values())
+    if errors is None:
+        errors = sum(
+            count
+            for status, count in statuses.items()
+            if status == "error" or int(status) >= 400
+        )
+    return {
+        "scenario": name,
+        "requests": requests,
+        "errors": errors,
+        "statuses": dict(statuses),
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 2) if elapsed else 0,
+        "latency_ms": {
+            "mean": round(statistics.fmean(latencies_ms), 2) if latencies_ms else 0,
+            "p50": round(percentile(latencies_ms, 50), 2),
+            "p95": round(percentile(latencies_ms, 95), 2),
+            "p99": round(percentile(latencies_ms, 99), 2),
+            "max": round(max(latencies_ms, default=0), 2),
+        },
+    }
+
+
+class Bench:
+    """Прогон сценариев против запущенного приложения (вместе с Postgres и Redis)."""
+
+    def __init__(self, client: httpx.AsyncClient, args):
+        self.client = client
+        self.args = args
+        self.rng = random.Random(args.seed)
+
+    def headers(self, token: str | None = None):
+        headers = {}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        if self.args.spoof_forwarded_for:
+            # у каждого запроса свой "клиент", иначе лимитер 2 запроса/5с
+            # превращает бенчмарк в замер RateLimiter
+            octets = [self.rng.randint(1, 254) for _ in range(3)]
+            headers["X-Forwarded-For"] = "10." + ".".join(map(str, octets))
+        return headers
+
+    async def run(self, name: str, send, requests: int | None = None):
+        requests = requests or self.args.requests
+        semaphore = asyncio.Semaphore(self.args.concurrency)
+        latencies = []
+        statuses = Counter()
+
+        async def one(number: int):
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await send(number)
+                    statuses[str(response.status_code)] += 1
+                except httpx.HTTPError:
+                    statuses["error"] += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(number) for number in range(requests)))
+        return summarize(name, latencies, statuses, time.perf_counter() - started)
+
+    async def login(self, username: str, password: str) -> str:
+        response = await self.client.post(
+            "/api/auth/login/",
+            data={"username": username, "password": password},
+            headers=self.headers(),
+        )
+        response.raise_for_status()
+        return response.json()["access_token"]
+
+    async def get_user_id(self, token: str, username: str) -> int:
+        response = await self.client.get(
+            "/api/users/all", params={"username": username}, headers=self.headers(token)
+        )
+        response.raise_for_status()
+        return response.json()["items"][0]["id"]
+
+    async def get_task_ids(self, token: str) -> list[int]:
+        response = await self.client.get(
+            "/api/tasks/", params={"size": 100}, headers=self.headers(token)
+        )
+        response.raise_for_status()
+        return [task["id"] for task in response.json()["items"]]
+
+    def new_task(self, executor_id: int) -> dict:
+        today = date.today()
+        return {
+            "name": f"bench task {self.rng.randint(1, 10**9)}",
+            "description": "benchmark",
+            "created_at": today.isoformat(),
+            "deadline": (today + timedelta(days=7)).isoformat(),
+            "executors_id": [executor_id],
+        }
+
+    async def websocket_fanout(self, manager_token: str, user_token: str, user_id):
+        """
+        Задержка доставки события create_task на --sockets сокетов юзера,
+        который назначен исполнителем.
+        """
+
+        url = self.args.base_url.replace("http", "ws", 1) + "/api/users/ws/"
+        sockets = [
+            await websockets.connect(
+                url, extra_headers={"Authorization": f"Bearer {user_token}"}
+            )
+            for _ in range(self.args.sockets)
+        ]
+        deliveries = []
+        publish = []
+        try:
+            for _ in range(self.args.fanout_rounds):
+                started = time.perf_counter()
+                receivers = [asyncio.create_task(socket.recv()) for socket in sockets]
+                await self.client.post(
+                    "/api/tasks/create",
+                    json=self.new_task(user_id),
+                    headers=self.headers(manager_token),
+                )
+                publish.append(time.perf_counter() - started)
+                try:
+                    for receiver in asyncio.as_completed(receivers, timeout=10):
+                        await receiver
+                        deliveries.append(time.perf_counter() - started)
+                except asyncio.TimeoutError:
+                    for receiver in receivers:
+                        receiver.cancel()
+        finally:
+            for socket in sockets:
+                await socket.close()
+
+        result = summarize(
+            "websocket_fanout",
+            deliveries,
+            Counter({"delivered": len(deliveries)}),
+            sum(publish),
+            errors=self.args.sockets * self.args.fanout_rounds - len(deliveries),
+        )
+        result["sockets"] = self.args.sockets
+        result["publish_request_ms"] = {
+            "p50": round(percentile([p * 1000 for p in publish], 50), 2),
+            "p99": round(percentile([p * 1000 for p in publish], 99), 2),
+        }
+        return result
+
+    async def all(self):
+        args = self.args
+        manager_token = await self.login(args.manager, args.manager_password)
+        user_token = await self.login(args.user, args.user_password)
+        user_id = await self.get_user_id(manager_token, args.user)
+        task_ids = await self.get_task_ids(manager_token)
+
+        results = [
+            await self.run(
+                "login",
+                lambda _: self.client.post(
+                    "/api/auth/login/",
+                    data={"username": args.user, "password": args.user_password},
+                    headers=self.headers(),
+                ),
+                requests=args.login_requests,
+            )
+        ]
+        for task_filter in TASK_FILTERS:
+            results.append(
+                await self.run(
+                    "get_all_tasks " + json.dumps(task_filter, ensure_ascii=False),
+                    lambda _, params=task_filter: self.client.get(
+                        "/api/tasks/", params=params, headers=self.headers(user_token)
+                    ),
+                )
+            )
+        results.append(
+            await self.run(
+                "get_task_id",
+                lambda _: self.client.get(
+                    f"/api/tasks/{self.rng.choice(task_ids)}",
+                    headers=self.headers(user_token),
+                ),
+            )
+        )
+        results.append(
+            await self.run(
+                "get_user_by_id",
+                lambda _: self.client.get(
+                    f"/api/users/{user_id}", headers=self.headers(user_token)
+                ),
+            )
+        )
+        results.append(
+            await self.run(
+                "create_task",
+                lambda _: self.client.post(
+                    "/api/tasks/create",
+                    json=self.new_task(user_id),
+                    headers=self.headers(manager_token),
+                ),
+            )
+        )
+        results.append(
+            await self.run(
+                "update_task",
+                lambda _: self.client.patch(
+                    f"/api/tasks/{self.rng.choice(task_ids)}",
+                    json={"status": self.rng.choice(MANAGER_STATUSES)},
+                    headers=self.headers(manager_token),
+                ),
+            )
+        )
+        results.append(await self.websocket_fanout(manager_token, user_token, user_id))
+        return results
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description="Бенчмарк эндпоинтов: пропускная способность и p50/p95/p99."
+    )
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--manager", required=True, help="Логин менеджера")
+    parser.add_argument("--manager-password", required=True)
+    parser.add_argument("--user", required=True, help="Логин юзера-исполнителя")
+    parser.add_argument("--user-password", required=True)
+    parser.add_argument(
+        "--requests", type=int, default=500, help="Запросов на сценарий"
+    )
+    parser.add_argument("--login-requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--sockets", type=int, default=100, help="Сокетов для fan-out")
+    parser.add_argument("--fanout-rounds", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--no-spoof-forwarded-for",
+        dest="spoof_forwarded_for",
+        action="store_false",
+        help="Не подменять X-Forwarded-For (запросы упрутся в RateLimiter)",
+    )
+    parser.add_argument("--output", help="Файл для результатов, по умолчанию stdout")
+    args = parser.parse_args()
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=30) as client:
+        scenarios = await Bench(client, args).all()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "base_url": args.base_url,
+        "concurrency": args.concurrency,
+        "scenarios": scenarios,
+    }
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
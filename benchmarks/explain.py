@@ -0,0 +1,189 @@
+import argparse
+import asyncio
+import json
+import sys
+
+from fastapi_pagination import Params
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from app.api.db import Task, User, UserRole, sessionmanager
+from app.api.db.models import UserTasksAssociation
+from app.api.endpoints.filter import (ExecutorFilter, TaskFilter, UserFilter,
+                                      UserTaskFilter)
+from app.api.endpoints.pagination import get_keyset_order
+from app.api.endpoints.tasks_utils import (search_order, task_by_id_query,
+                                           tasks_count_query,
+                                           tasks_cursor_query,
+                                           tasks_page_query,
+                                           tasks_search_query)
+
+TABLES = ("tasks", "users", "usertasksassociations")
+PAGE = Params(page=1, size=50)
+
+
+def seq_scans(plan: dict) -> list[str]:
+    """Таблицы, которые план читает последовательным сканированием."""
+
+    tables = []
+    if plan["Node Type"] == "Seq Scan" and plan["Relation Name"] in TABLES:
+        tables.append(plan["Relation Name"])
+    for child in plan.get("Plans", ()):
+        tables.extend(seq_scans(child))
+    return tables
+
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN запроса с теми же параметрами, с которыми его выполняет приложение."""
+
+    inherit_cache = False
+
+    def __init__(self, statement, analyze: bool = False):
+        self.statement = statement
+        self.analyze = analyze
+
+
+@compiles(Explain, "postgresql")
+def compile_explain(element: Explain, compiler, **kwargs):
+    options = "ANALYZE, FORMAT JSON" if element.analyze else "FORMAT JSON"
+    return f"EXPLAIN ({options}) " + compiler.process(element.statement, **kwargs)
+
+
+async def explain(session: AsyncSession, query, analyze: bool = False) -> dict:
+    plan = (await session.execute(Explain(query, analyze))).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]
+
+
+async def sample(session: AsyncSession) -> dict:
+    """Значения фильтров из данных, чтобы запросы что-то находили."""
+
+    task = (
+        await session.execute(select(Task).order_by(Task.id.desc()).limit(1))
+    ).scalar_one()
+    executor_id = await session.scalar(select(UserTasksAssociation.user_id).limit(1))
+    return {
+        "task": task,
+        "manager": await session.scalar(
+            select(User).where(User.role == UserRole.MANAGER).limit(1)
+        ),
+        "executor": await session.scalar(
+            select(User.username).where(User.id == executor_id)
+        ),
+    }
+
+
+def task_filter(**params) -> TaskFilter:
+    # вне запроса FilterDepends не разрешается, вложенные фильтры явно
+    return TaskFilter(**{"creator": None, "executor": None, **params})
+
+
+def queries(values: dict) -> dict:
+    """Стандартные запросы фильтров тасок и юзеров и поиски каскадов удаления."""
+
+    task, manager = values["task"], values["manager"]
+    by_name = task_filter(name__ilike=f"%{task.name}%")
+    by_created = task_filter(created_at=task.created_at)
+    by_deadline = task_filter(deadline=task.deadline or task.created_at)
+    by_status = task_filter(status=task.status, order_by=["deadline"])
+    by_creator = task_filter(creator=UserTaskFilter(username=manager.username))
+    by_executor = task_filter(executor=ExecutorFilter(username=values["executor"]))
+    by_email = UserFilter(email__ilike=f"%{values['executor']}@%")
+    search = max((task.description or task.name).split(), key=len)
+    # слово из названия каждой сгенерированной таски: ранжируется не вся таблица
+    common = "task"
+    return {
+        "task by id": task_by_id_query(task.id),
+        "tasks name__ilike": tasks_page_query(by_name, PAGE),
+        "tasks name__ilike count": tasks_count_query(by_name),
+        "tasks created_at": tasks_page_query(by_created, PAGE),
+        "tasks created_at count": tasks_count_query(by_created),
+        "tasks deadline": tasks_page_query(by_deadline, PAGE),
+        "tasks deadline count": tasks_count_query(by_deadline),
+        "tasks status order_by deadline": tasks_page_query(by_status, PAGE),
+        "tasks status cursor": tasks_cursor_query(
+            by_status, get_keyset_order(Task, by_status.ordering_values), None, 50
+        ),
+        "tasks search": tasks_search_query(
+            search, task_filter(), search_order(search), None, 50
+        ),
+        "tasks search status": tasks_search_query(
+            search, by_status, search_order(search), None, 50
+        ),
+        "tasks search common word": tasks_search_query(
+            common, task_filter(), search_order(common), None, 50
+        ),
+        "tasks creator": tasks_page_query(by_creator, PAGE),
+        "tasks creator count": tasks_count_query(by_creator),
+        "tasks executor": tasks_page_query(by_executor, PAGE),
+        "tasks executor count": tasks_count_query(by_executor),
+        "users email__ilike": by_email.filter(select(User)).limit(50),
+        # строки, которые Postgres ищет при каскадах удаления таски и юзера
+        "cascade task executors": select(UserTasksAssociation.id).where(
+            UserTasksAssociation.task_id == task.id
+        ),
+        "cascade user tasks": select(Task.id).where(Task.creator_id == manager.id),
+    }
+
+
+async def check(min_rows: int) -> int:
+    """
+    EXPLAIN стандартных запросов: ни один не должен читать таблицы
+    последовательным сканированием. Возвращает число провалившихся.
+    """
+
+    async with sessionmanager.session() as session:
+        # после COPY статистики еще нет, без нее планы случайны
+        await session.execute(text(f"ANALYZE {', '.join(TABLES)}"))
+        rows = await session.scalar(
+            text("SELECT reltuples::bigint FROM pg_class WHERE relname = 'tasks'")
+        )
+        if rows is None or rows < min_rows:
+            sys.exit(
+                f"В tasks {rows} строк, нужно не меньше {min_rows}: "
+                "сгенерируйте данные через commands.generate_dataset"
+            )
+
+        failed = 0
+        for name, query in queries(await sample(session)).items():
+            # поиск еще и выполняется: Seq Scan в нем нет, но время
+            # зависит от числа ранжируемых строк
+            result = await explain(session, query, analyze="search" in name)
+            plan = result["Plan"]
+            tables = seq_scans(plan)
+            if tables:
+                failed += 1
+                print(f"FAIL {name}: Seq Scan по {', '.join(tables)}")
+            elif "Execution Time" in result:
+                print(f"ok   {name}: {result['Execution Time']:.1f} ms")
+            else:
+                print(f"ok   {name}: cost {plan['Total Cost']}")
+    return failed
+
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Проверка планов запросов фильтров: падает, если запрос "
+            "на большой таблице выполняется последовательным сканированием."
+        )
+    )
+    parser.add_argument(
+        "--min-rows",
+        type=int,
+        default=100_000,
+        help="Минимум строк в tasks, на меньших данных Seq Scan бывает дешевле",
+    )
+    args = parser.parse_args()
+
+    failed = await check(args.min_rows)
+    await sessionmanager.close()
+    if failed:
+        sys.exit(f"{failed} запросов без индекса")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
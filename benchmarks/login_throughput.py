@@ -0,0 +1,81 @@
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from app.api.endpoints.auth import PasswordHasher, pwd_context, verify_password
+from benchmarks.utils import percentile
+
+PASSWORD = "Benchmark1"
+
+
+async def measure_loop_lag(stop: asyncio.Event, interval: float, lags: list):
+    """Насколько позже запланированного просыпается корутина-пульс."""
+
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+
+async def inline_login(hashed: str):
+    # так проверялся пароль до выноса bcrypt в пул потоков
+    return verify_password(PASSWORD, hashed)
+
+
+async def run(mode: str, logins: int, concurrency: int, hasher: PasswordHasher):
+    hashed = pwd_context.hash(PASSWORD)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def login():
+        async with semaphore:
+            if mode == "inline":
+                return await inline_login(hashed)
+            return await hasher.verify(PASSWORD, hashed)
+
+    stop = asyncio.Event()
+    lags = []
+    heartbeat = asyncio.create_task(measure_loop_lag(stop, 0.01, lags))
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await heartbeat
+
+    lags_ms = [lag * 1000 for lag in lags] or [0.0]
+    return {
+        "mode": mode,
+        "logins": logins,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "logins_per_second": round(logins / elapsed, 2),
+        "loop_lag_ms": {
+            "mean": round(statistics.fmean(lags_ms), 2),
+            "p99": round(percentile(lags_ms, 99), 2),
+            "max": round(max(lags_ms), 2),
+        },
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description="Пропускная способность логина и отзывчивость event loop."
+    )
+    parser.add_argument("--logins", type=int, default=200, help="Число логинов")
+    parser.add_argument("--concurrency", type=int, default=50, help="Параллельность")
+    parser.add_argument("--workers", type=int, default=4, help="Потоки bcrypt")
+    parser.add_argument(
+        "--mode", choices=["inline", "executor", "both"], default="both"
+    )
+    args = parser.parse_args()
+
+    hasher = PasswordHasher(workers=args.workers, queue=args.logins)
+    modes = ["inline", "executor"] if args.mode == "both" else [args.mode]
+    results = [await run(mode, args.logins, args.concurrency, hasher) for mode in modes]
+    hasher.close()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,53 @@
+import sys
+import time
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def batched(iterable, size: int):
+    """Разбиение итерируемого объекта на списки по size элементов."""
+
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def copy_records(
+    session: AsyncSession, table: str, columns: list[str], records: list[tuple]
+) -> None:
+    """
+    COPY строк в таблицу через asyncpg-соединение сессии. Если в сессии уже
+    открыта транзакция, COPY выполняется в ней.
+    """
+
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(
+        table, records=records, columns=columns
+    )
+
+
+class Progress:
+    """Вывод прогресса загрузки в одну строку."""
+
+    def __init__(self, label: str, total: int | None = None):
+        self.label = label
+        self.total = total
+        self.done = 0
+        self.started = time.perf_counter()
+
+    def update(self, count: int) -> None:
+        self.done += count
+        elapsed = time.perf_counter() - self.started
+        rate = self.done / elapsed if elapsed else 0
+        total = f"/{self.total}" if self.total else ""
+        sys.stdout.write(f"\r{self.label}: {self.done}{total} ({rate:.0f} строк/с)")
+        sys.stdout.flush()
+
+    def finish(self) -> None:
+        sys.stdout.write("\n")
@@ -1,76 +1,121 @@
+import argparse
 import asyncio
 import json
+import os
 import random
+from concurrent.futures import ProcessPoolExecutor
 
 from sqlalchemy import insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.db import Task, User, UserRole, sessionmanager
-from app.api.db.models import UserTasksAssociation
 from app.api.endpoints.users import hash_pass
+from commands.bulk import Progress, batched, copy_records
 
 
-async def filter_user_role(role: UserRole, session: AsyncSession):
-    stmt = await session.execute(select(User).where(User.role == role))
-    return stmt
+async def filter_user_role(role: UserRole, session: AsyncSession) -> list[int]:
+    stmt = await session.execute(select(User.id).where(User.role == role))
+    return list(stmt.scalars().all())
 
 
-async def load_users(filename: str) -> None:
-    """Наполнение БД тестовыми юзерами."""
+async def load_users(filename: str, batch_size: int, processes: int) -> None:
+    """
+    Наполнение БД тестовыми юзерами. Пароли хэшируются в пуле процессов,
+    юзеры вставляются пачками по batch_size.
+    """
 
     with open(filename, "r", encoding="utf-8") as file:
         users = json.load(file)
+
+    progress = Progress("users", total=len(users))
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(max_workers=processes) as pool:
         async with sessionmanager.session() as session:
-            await session.execute(
-                insert(User),
-                [
-                    {
-                        "username": user["username"],
-                        "password": hash_pass(user["password"]),
-                        "email": user["email"],
-                        "role": user["role"],
-                    }
-                    for user in users
-                ],
-            )
+            for batch in batched(users, batch_size):
+                hashed = await loop.run_in_executor(
+                    None,
+                    lambda passwords: list(
+                        pool.map(hash_pass, passwords, chunksize=16)
+                    ),
+                    [user["password"] for user in batch],
+                )
+                await session.execute(
+                    insert(User),
+                    [
+                        {
+                            "username": user["username"],
+                            "password": password,
+                            "email": user["email"],
+                            "role": user["role"],
+                        }
+                        for user, password in zip(batch, hashed)
+                    ],
+                )
+                progress.update(len(batch))
             await session.commit()
+    progress.finish()
     print(f"БД заполнена тестовыми user-ами")
 
 
-async def load_tasks(filename: str) -> None:
+async def load_tasks(filename: str, batch_size: int) -> None:
+    """
+    Наполнение БД тестовыми тасками: таски вставляются многострочным
+    INSERT ... RETURNING, связи с исполнителями через COPY.
+    """
+
     with open(filename, "r", encoding="utf-8") as file:
         tasks = json.load(file)
-        data_executors = []
-        data_creators = []
-        async with sessionmanager.session() as session:
-            stmt = await filter_user_role(role=UserRole.USER, session=session)
-            data_executors.extend([executor.id for executor in stmt.scalars().all()])
 
-            stmt = await filter_user_role(role=UserRole.MANAGER, session=session)
-            data_creators.extend([creator.id for creator in stmt.scalars().all()])
+    progress = Progress("tasks", total=len(tasks))
+    async with sessionmanager.session() as session:
+        data_executors = await filter_user_role(role=UserRole.USER, session=session)
+        data_creators = await filter_user_role(role=UserRole.MANAGER, session=session)
 
-            for task in tasks:
-                new_task = Task(
-                    name=task["name"],
-                    description=task["description"],
-                    creator_id=random.choice(data_creators),
-                )
-                session.add(new_task)
-                await session.flush()
-                list_users_task = [
-                    UserTasksAssociation(
-                        user_id=random.choice(data_executors), task_id=new_task.id
-                    )
-                ]
-                session.add_all(list_users_task)
-            await session.commit()
+        for batch in batched(tasks, batch_size):
+            result = await session.execute(
+                insert(Task).returning(Task.id, sort_by_parameter_order=True),
+                [
+                    {
+                        "name": task["name"],
+                        "description": task["description"],
+                        "creator_id": random.choice(data_creators),
+                    }
+                    for task in batch
+                ],
+            )
+            await copy_records(
+                session,
+                "usertasksassociations",
+                columns=["user_id", "task_id", "is_executor"],
+                records=[
+                    (random.choice(data_executors), task_id, False)
+                    for task_id in result.scalars().all()
+                ],
+            )
+            progress.update(len(batch))
+        await session.commit()
 
+    progress.finish()
     print(f"Таски успешно добавлены")
 
 
 async def main():
-    await load_users("commands/data/test_users.json")
-    await load_tasks("commands/data/test_tasks.json")
+    parser = argparse.ArgumentParser(description="Наполнение БД тестовыми данными.")
+    parser.add_argument("--users", default="commands/data/test_users.json")
+    parser.add_argument("--tasks", default="commands/data/test_tasks.json")
+    parser.add_argument(
+        "--batch-size", type=int, default=1000, help="Размер пачки вставки"
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=os.cpu_count(),
+        help="Число процессов для хэширования паролей",
+    )
+    args = parser.parse_args()
+
+    await load_users(args.users, args.batch_size, args.processes)
+    await load_tasks(args.tasks, args.batch_size)
 
 
 if __name__ == "__main__":
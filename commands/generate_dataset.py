@@ -0,0 +1,246 @@
+import argparse
+import asyncio
+import random
+from datetime import date, timedelta
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.db import Task, TaskStatus, User, UserRole, sessionmanager
+from app.api.endpoints.users import hash_pass
+from commands.bulk import Progress, batched, copy_records
+
+WORDS = (
+    "report review deploy release fix migrate update design test refactor "
+    "client server database index cache queue api dashboard invoice sprint "
+    "backlog meeting audit security billing search export import monitoring"
+).split()
+
+STATUS_WEIGHTS = {
+    TaskStatus.CREATED: 25,
+    TaskStatus.AT_WORK: 30,
+    TaskStatus.ON_CHECK: 10,
+    TaskStatus.FROZEN: 5,
+    TaskStatus.CANCEL: 5,
+    TaskStatus.FINISHED: 25,
+}
+# доля тасок с 0, 1, 2, ... исполнителями
+EXECUTORS_WEIGHTS = [5, 55, 25, 10, 3, 2]
+
+USER_COLUMNS = ["id", "username", "password", "email", "role", "created_at"]
+TASK_COLUMNS = [
+    "id",
+    "name",
+    "description",
+    "created_at",
+    "urgency",
+    "status",
+    "deadline",
+    "creator_id",
+]
+
+
+async def get_max_id(model, session: AsyncSession) -> int:
+    return await session.scalar(select(func.coalesce(func.max(model.id), 0)))
+
+
+def generate_users(
+    rng: random.Random,
+    first_id: int,
+    count: int,
+    role: UserRole,
+    password: str,
+    today: date,
+):
+    """Юзеры с последовательными id, чтобы таски ссылались на них без запросов."""
+
+    prefix = role.name.lower()
+    for user_id in range(first_id, first_id + count):
+        yield (
+            user_id,
+            f"{prefix}{user_id}",
+            password,
+            f"{prefix}{user_id}@example.com",
+            role.name,
+            today - timedelta(days=rng.randint(0, 3 * 365)),
+        )
+
+
+def generate_tasks(
+    rng: random.Random,
+    first_id: int,
+    count: int,
+    managers: range,
+    users: range,
+    max_executors: int,
+    today: date,
+):
+    """Таски и их исполнители; генерируются лениво, по одной."""
+
+    statuses = list(STATUS_WEIGHTS)
+    status_weights = list(STATUS_WEIGHTS.values())
+    executors_counts = list(range(min(len(EXECUTORS_WEIGHTS), max_executors + 1)))
+    executors_weights = EXECUTORS_WEIGHTS[: len(executors_counts)]
+
+    for task_id in range(first_id, first_id + count):
+        created_at = today - timedelta(days=rng.randint(0, 2 * 365))
+        deadline = (
+            created_at + timedelta(days=rng.randint(1, 90))
+            if rng.random() < 0.9
+            else None
+        )
+        description = " ".join(rng.choices(WORDS, k=rng.randint(5, 40))).capitalize()
+        task = (
+            task_id,
+            f"Task {task_id}",
+            description,
+            created_at,
+            rng.random() < 0.1,
+            rng.choices(statuses, status_weights)[0].name,
+            deadline,
+            # у части менеджеров тасок заметно больше, чем у остальных
+            managers[int(len(managers) * rng.random() ** 2)],
+        )
+        executors_count = rng.choices(executors_counts, executors_weights)[0]
+        executors = rng.sample(users, min(executors_count, len(users)))
+        yield task, [(user_id, task_id, False) for user_id in executors]
+
+
+async def copy_users(session: AsyncSession, users, batch_size: int, label: str):
+    progress = Progress(label)
+    for batch in batched(users, batch_size):
+        await copy_records(session, "users", USER_COLUMNS, batch)
+        await session.commit()
+        progress.update(len(batch))
+    progress.finish()
+
+
+async def copy_tasks(session: AsyncSession, tasks, batch_size: int, total: int):
+    progress = Progress("tasks", total=total)
+    for batch in batched(tasks, batch_size):
+        await copy_records(session, "tasks", TASK_COLUMNS, [task for task, _ in batch])
+        await copy_records(
+            session,
+            "usertasksassociations",
+            ["user_id", "task_id", "is_executor"],
+            [executor for _, executors in batch for executor in executors],
+        )
+        await session.commit()
+        progress.update(len(batch))
+    progress.finish()
+
+
+async def generate_dataset(
+    managers: int,
+    users: int,
+    tasks: int,
+    seed: int,
+    batch_size: int,
+    max_executors: int,
+    password: str,
+    today: date,
+) -> None:
+    """
+    Генерация воспроизводимого набора данных нужного размера. Строки
+    генерируются пачками и сразу отправляются в БД через COPY, поэтому
+    весь набор никогда не держится в памяти.
+    """
+
+    rng = random.Random(seed)
+    # bcrypt для миллионов юзеров занял бы часы, у всех один и тот же пароль
+    hashed_password = hash_pass(password)
+
+    async with sessionmanager.session() as session:
+        first_user_id = await get_max_id(User, session) + 1
+        first_task_id = await get_max_id(Task, session) + 1
+        managers_ids = range(first_user_id, first_user_id + managers)
+        users_ids = range(managers_ids.stop, managers_ids.stop + users)
+
+        await copy_users(
+            session,
+            generate_users(
+                rng,
+                managers_ids.start,
+                managers,
+                UserRole.MANAGER,
+                hashed_password,
+                today,
+            ),
+            batch_size,
+            "managers",
+        )
+        await copy_users(
+            session,
+            generate_users(
+                rng, users_ids.start, users, UserRole.USER, hashed_password, today
+            ),
+            batch_size,
+            "users",
+        )
+        await copy_tasks(
+            session,
+            generate_tasks(
+                rng,
+                first_task_id,
+                tasks,
+                managers_ids,
+                users_ids,
+                max_executors,
+                today,
+            ),
+            batch_size,
+            tasks,
+        )
+
+        # id вставлялись явно, сдвигаем последовательности
+        for table in ("users", "tasks"):
+            await session.execute(
+                text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                    f"(SELECT max(id) FROM {table}))"
+                )
+            )
+        await session.commit()
+
+    print(f"Сгенерировано: {managers} менеджеров, {users} юзеров, {tasks} тасок")
+
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description="Генерация синтетического набора данных для нагрузочных тестов."
+    )
+    parser.add_argument("--managers", type=int, default=100, help="Число менеджеров")
+    parser.add_argument("--users", type=int, default=10_000, help="Число юзеров")
+    parser.add_argument("--tasks", type=int, default=100_000, help="Число тасок")
+    parser.add_argument("--seed", type=int, default=42, help="Seed генератора")
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument(
+        "--max-executors", type=int, default=5, help="Максимум исполнителей у таски"
+    )
+    parser.add_argument(
+        "--password", default="Password1", help="Пароль всех сгенерированных юзеров"
+    )
+    parser.add_argument(
+        "--today",
+        type=date.fromisoformat,
+        default=date(2024, 1, 1),
+        help="Дата, от которой отсчитываются даты создания и дедлайны (YYYY-MM-DD)",
+    )
+    args = parser.parse_args()
+    if args.managers < 1 or args.users < 1:
+        parser.error("нужен хотя бы один менеджер и один юзер")
+
+    await generate_dataset(
+        managers=args.managers,
+        users=args.users,
+        tasks=args.tasks,
+        seed=args.seed,
+        batch_size=args.batch_size,
+        max_executors=args.max_executors,
+        password=args.password,
+        today=args.today,
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,104 @@
+import argparse
+import asyncio
+import sys
+
+from sqlalchemy import delete, func, select, text, update
+
+from app.api.db import sessionmanager
+from app.api.db.models import TaskStat, TaskStatDay, TaskStatDelta
+
+# счетчики taskstats, посчитанные заново по tasks и usertasksassociations
+EXPECTED = """
+SELECT
+    coalesce(t.creator_id, 0) AS creator_id, a.user_id AS executor_id, t.status,
+    count(*) AS count, count(*) FILTER (WHERE t.deadline < :day) AS overdue
+FROM tasks t
+JOIN LATERAL (
+    SELECT 0 AS user_id
+    UNION ALL
+    SELECT user_id FROM usertasksassociations WHERE task_id = t.id
+) a ON true
+GROUP BY 1, 2, 3
+"""
+# текущие счетчики: строки taskstats плюс еще не перенесенные изменения
+COUNTERS = """
+SELECT creator_id, executor_id, status, sum(count) AS count, sum(overdue) AS overdue
+FROM (
+    SELECT creator_id, executor_id, status, count, overdue FROM taskstats
+    UNION ALL
+    SELECT
+        creator_id, executor_id, status, delta,
+        CASE WHEN deadline < :day THEN delta ELSE 0 END
+    FROM taskstatdeltas
+) c
+GROUP BY 1, 2, 3
+"""
+DRIFT = f"""
+SELECT count(*)
+FROM ({EXPECTED}) e
+FULL JOIN ({COUNTERS}) s USING (creator_id, executor_id, status)
+WHERE coalesce(e.count, 0) <> coalesce(s.count, 0)
+    OR coalesce(e.overdue, 0) <> coalesce(s.overdue, 0)
+"""
+
+
+async def rebuild_task_stats(check: bool) -> int:
+    """
+    Сверка счетчиков taskstats с тасками и их пересборка с нуля. Таски и
+    счетчики читаются из одного снимка REPEATABLE READ, поэтому запись в
+    таски не блокируется. Возвращает число расходившихся строк.
+    """
+
+    async with sessionmanager.session() as session:
+        await session.connection(
+            execution_options={"isolation_level": "REPEATABLE READ"}
+        )
+        if not check:
+            # до первого запроса: снимок берется уже после блокировки, и
+            # task_stats_compact не переносит изменения, пока идет пересборка
+            await session.execute(
+                text("LOCK TABLE taskstats, taskstatdays IN EXCLUSIVE MODE")
+            )
+        day = await session.scalar(select(TaskStatDay.as_of))
+        drift = await session.scalar(text(DRIFT), {"day": day})
+        print(f"Расходится строк: {drift}")
+        if check:
+            return drift
+
+        # изменения, закоммиченные после снимка, в нем не видны и остаются
+        today = await session.scalar(select(func.current_date()))
+        await session.execute(delete(TaskStatDelta))
+        await session.execute(delete(TaskStat))
+        await session.execute(
+            text(
+                "INSERT INTO taskstats "
+                "(creator_id, executor_id, status, count, overdue) "
+                f"SELECT * FROM ({EXPECTED}) e"
+            ),
+            {"day": today},
+        )
+        await session.execute(update(TaskStatDay).values(as_of=today))
+        await session.commit()
+        print(f"taskstats пересобрана на {today}")
+    return drift
+
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description="Сверка и пересборка счетчиков статистики тасок (taskstats)."
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Только сверить; код выхода 1, если счетчики расходятся",
+    )
+    args = parser.parse_args()
+
+    drift = await rebuild_task_stats(args.check)
+    await sessionmanager.close()
+    if args.check and drift:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
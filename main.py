@@ -9,6 +9,12 @@ from redis import asyncio as aioredis
 from sqladmin import Admin
 
 from app.api import router
+from app.api.core import (
+    CacheBackend,
+    RequestScopeMiddleware,
+    cache_key_builder,
+    pubsub,
+)
 from app.api.db import sessionmanager
 from app.api.db.admin import (
     AdminAuth,
@@ -18,6 +24,7 @@ from app.api.db.admin import (
 )
 from app.api.db.admin import router as admin_router
 from app.api.db.settings_db import settings
+from app.api.endpoints.auth import hasher
 
 
 @asynccontextmanager
@@ -25,15 +32,25 @@ async def lifespan(app: FastAPI):
     redis = aioredis.from_url(
         "redis://redis:6379", encoding="utf8", decode_responses=True
     )
-    FastAPICache.init(RedisBackend(redis), prefix="fastapi-cache")
+    FastAPICache.init(
+        CacheBackend(
+            RedisBackend(redis), l1_size=settings.L1.SIZE, l1_ttl=settings.L1.TTL
+        ),
+        prefix="fastapi-cache",
+        key_builder=cache_key_builder,
+    )
     await FastAPILimiter.init(redis)
+    await pubsub.init(redis if settings.PUBSUB.BACKEND == "redis" else None)
 
     yield
+    await pubsub.close()
+    hasher.close()
     if sessionmanager.engine is not None:
         await sessionmanager.close()
 
 
 app = FastAPI(lifespan=lifespan)
+app.add_middleware(RequestScopeMiddleware)
 
 
 admin = Admin(